@@ -1,32 +1,89 @@
-import pickle
 import os
-from flask import Flask, request, render_template, redirect, url_for, session, flash
+import tempfile
+import threading
+from flask import Flask, request, render_template, redirect, url_for, session, flash, Response
 from functools import wraps
-from authlib.integrations.flask_client import OAuth
-import numpy as np
-import pandas as pd
-from src.pipeline.predict_pipeline import CustomData, PredictPipeline
 from database import init_db, create_user, authenticate_user, get_user_by_username, get_user_by_email
+from session_store import SQLiteSessionInterface
 
-from sklearn.preprocessing import StandardScaler
+# The ML stack (pandas, sklearn, the predict pipeline) and authlib are imported
+# lazily or in preload(), so importing this module stays cheap for every worker.
 
 application = Flask(__name__)
 
 app = application
 app.secret_key = 'your-secret-key-change-in-production'
 
-# Initialize database
-init_db()
-
-# Google OAuth Configuration
-oauth = OAuth(app)
-google = oauth.register(
-    name='google',
-    client_id=os.getenv('GOOGLE_CLIENT_ID', 'your-google-client-id'),
-    client_secret=os.getenv('GOOGLE_CLIENT_SECRET', 'your-google-client-secret'),
-    server_metadata_url='https://accounts.google.com/.well-known/openid-configuration',
-    client_kwargs={'scope': 'openid email profile'}
-)
+_db_lock = threading.Lock()
+_db_ready = False
+
+_oauth_lock = threading.Lock()
+_google = None
+
+_batcher_config = None
+
+def ensure_database():
+    """Initialize the database once per process"""
+    global _db_ready
+    if not _db_ready:
+        with _db_lock:
+            if not _db_ready:
+                init_db()
+                _db_ready = True
+
+def get_google():
+    """Google OAuth client, registered on first use"""
+    global _google
+    if _google is None:
+        with _oauth_lock:
+            if _google is None:
+                from authlib.integrations.flask_client import OAuth
+                oauth = OAuth(app)
+                _google = oauth.register(
+                    name='google',
+                    client_id=os.getenv('GOOGLE_CLIENT_ID', 'your-google-client-id'),
+                    client_secret=os.getenv('GOOGLE_CLIENT_SECRET', 'your-google-client-secret'),
+                    server_metadata_url='https://accounts.google.com/.well-known/openid-configuration',
+                    client_kwargs={'scope': 'openid email profile'}
+                )
+    return _google
+
+def get_batcher():
+    """Micro-batcher for /api/predict, window configured by MICRO_BATCH_MAX_ROWS / MICRO_BATCH_WAIT_MS"""
+    global _batcher_config
+    from src.pipeline.micro_batcher import MicroBatcherConfig, get_micro_batcher
+    if _batcher_config is None:
+        _batcher_config = MicroBatcherConfig(
+            max_batch_size=int(os.getenv('MICRO_BATCH_MAX_ROWS', '64')),
+            max_wait_ms=float(os.getenv('MICRO_BATCH_WAIT_MS', '2'))
+        )
+    return get_micro_batcher(_batcher_config)
+
+def warm_model():
+    """Load and warm the model artifacts once instead of on the first prediction"""
+    from src.pipeline.model_registry import get_model_registry
+    try:
+        get_model_registry().get()
+    except Exception as e:
+        print(f"Model artifacts not loaded at startup: {e}")
+
+def preload():
+    """Do all one-time startup work up front, e.g. from a server preload hook"""
+    ensure_database()
+    warm_model()
+    get_google()
+
+# Logged-in sessions live in the user_sessions table; the cookie only carries a token
+app.session_interface = SQLiteSessionInterface(prepare=ensure_database)
+
+@app.before_request
+def initialize_database():
+    ensure_database()
+
+# With PRELOAD_APP=1 (set by gunicorn.conf.py) the startup work runs once in the
+# master before it forks, so all workers share one physical copy of the model pages
+if os.getenv('PRELOAD_APP') == '1':
+    preload()
 
 def login_required(f):
     @wraps(f)
@@ -86,11 +143,11 @@ def login():
 @app.route('/login/google')
 def google_login():
     redirect_uri = url_for('google_callback', _external=True)
-    return google.authorize_redirect(redirect_uri)
+    return get_google().authorize_redirect(redirect_uri)
 
 @app.route('/login/google/callback')
 def google_callback():
-    token = google.authorize_access_token()
+    token = get_google().authorize_access_token()
     user_info = token.get('userinfo')
     
     if user_info:
@@ -135,6 +192,8 @@ def predict_datapoint():
     if request.method == 'GET':
         return render_template('home.html')
     else:
+        from src.pipeline.predict_pipeline import CustomData, PredictPipeline
+
         data=CustomData(
             gender=request.form.get('gender'),
             race_ethnicity=request.form.get('ethnicity'),
@@ -145,14 +204,89 @@ def predict_datapoint():
             writing_score=float(request.form.get('reading_score'))
 
         )
-        pred_df=data.get_data_as_data_frame()
-        print(pred_df)
-
         predict_pipeline=PredictPipeline()
-        results=predict_pipeline.predict(pred_df)
+        results=predict_pipeline.predict_rows([data.get_data_as_dict()])
         value = results[0]
         formatted = f"{float(value):.3f}"
         return render_template('home.html', results=formatted)
+
+@app.route('/predictbatch', methods=['POST'])
+@login_required
+def predict_batch():
+    upload = request.files.get('file')
+    if upload is None or upload.filename == '':
+        return {'error': 'Upload a CSV file in the "file" field'}, 400
+
+    # The upload is closed when the request ends, so spool it to disk and stream from there
+    spooled = tempfile.NamedTemporaryFile(suffix='.csv', delete=False)
+    upload.save(spooled)
+    spooled.close()
+
+    from src.pipeline.predict_pipeline import PredictPipeline
+    predict_pipeline = PredictPipeline()
+
+    def generate():
+        try:
+            yield from predict_pipeline.predict_csv(spooled.name)
+        finally:
+            os.remove(spooled.name)
+
+    return Response(
+        generate(),
+        mimetype='text/csv',
+        headers={'Content-Disposition': 'attachment; filename=predictions.csv'}
+    )
+
+API_FIELDS = (
+    'gender',
+    'race_ethnicity',
+    'parental_level_of_education',
+    'lunch',
+    'test_preparation_course',
+    'reading_score',
+    'writing_score',
+)
+
+@app.route('/api/predict', methods=['POST'])
+@login_required
+def api_predict():
+    payload = request.get_json(silent=True)
+    if payload is None:
+        payload = {}
+    if not isinstance(payload, dict):
+        return {'error': 'Request body must be a JSON object'}, 400
+    missing = [field for field in API_FIELDS if payload.get(field) is None]
+    if missing:
+        return {'error': f"Missing fields: {', '.join(missing)}"}, 400
+
+    from src.pipeline.predict_pipeline import CustomData, PredictPipeline
+
+    try:
+        data = CustomData(
+            gender=payload['gender'],
+            race_ethnicity=payload['race_ethnicity'],
+            parental_level_of_education=payload['parental_level_of_education'],
+            lunch=payload['lunch'],
+            test_preparation_course=payload['test_preparation_course'],
+            reading_score=float(payload['reading_score']),
+            writing_score=float(payload['writing_score'])
+        )
+    except (TypeError, ValueError):
+        return {'error': 'reading_score and writing_score must be numbers'}, 400
+
+    row = data.get_data_as_dict()
+    try:
+        # A row the model cannot score is the client's error, and must not reach a shared batch
+        unknown = PredictPipeline().unknown_categories(row)
+        if unknown:
+            details = ', '.join(f"{field} ({value!r})" for field, value in unknown.items())
+            return {'error': f"Unknown values for: {details}", 'fields': list(unknown)}, 400
+        value = get_batcher().submit(row)
+    except Exception as e:
+        print(f"Prediction failed: {e}")
+        return {'error': 'Prediction failed'}, 500
+    return {'math_score': float(value)}
     
 if __name__ == "__main__":
+    preload()
     app.run(host="0.0.0.0")
\ No newline at end of file
@@ -0,0 +1,203 @@
+#!/usr/bin/env python
+"""
+Serving benchmark for the prediction path.
+
+Measures latency percentiles and throughput for each layer of a prediction,
+using rows sampled from artifacts/test.csv:
+
+  custom_data_frame       CustomData.get_data_as_data_frame
+  predict_cold            PredictPipeline.predict with a freshly created registry
+                          (artifact load + warmup + predict)
+  predict_warm            PredictPipeline.predict on a loaded registry
+  predict_rows_warm       PredictPipeline.predict_rows on a loaded registry, cache disabled
+  route_predictdata       POST /predictdata through the Flask test client, per concurrency level
+
+Results are printed (and optionally written) as JSON so runs can be diffed.
+Anything the app prints while the benchmark runs goes to stderr, so stdout is
+just the report. The route benchmark runs against a temporary database, never
+the project's users.db.
+
+    python benchmarks/serving_benchmark.py --requests 500 --concurrency 1 4 16 --output bench.json
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+os.chdir(PROJECT_ROOT)
+
+import database  # noqa: E402
+from src.pipeline.model_registry import ModelRegistry  # noqa: E402
+from src.pipeline.prediction_cache import PredictionCache, PredictionCacheConfig  # noqa: E402
+from src.pipeline.predict_pipeline import CustomData, PredictPipeline  # noqa: E402
+
+FEATURE_COLUMNS = [
+    "gender",
+    "race_ethnicity",
+    "parental_level_of_education",
+    "lunch",
+    "test_preparation_course",
+    "reading_score",
+    "writing_score",
+]
+
+
+def sample_rows(n, seed):
+    test_df = pd.read_csv(os.path.join("artifacts", "test.csv"))
+    return test_df[FEATURE_COLUMNS].sample(n=n, replace=True, random_state=seed).to_dict("records")
+
+
+def summarize(latencies, wall_time):
+    latencies_ms = np.asarray(latencies) * 1000.0
+    return {
+        "count": int(latencies_ms.size),
+        "mean_ms": float(latencies_ms.mean()),
+        "p50_ms": float(np.percentile(latencies_ms, 50)),
+        "p95_ms": float(np.percentile(latencies_ms, 95)),
+        "p99_ms": float(np.percentile(latencies_ms, 99)),
+        "max_ms": float(latencies_ms.max()),
+        "throughput_per_s": float(latencies_ms.size / wall_time) if wall_time > 0 else None,
+    }
+
+
+def time_calls(fn, items):
+    latencies = []
+    start = time.perf_counter()
+    for item in items:
+        t0 = time.perf_counter()
+        fn(item)
+        latencies.append(time.perf_counter() - t0)
+    return summarize(latencies, time.perf_counter() - start)
+
+
+def custom_data(row):
+    return CustomData(**row)
+
+
+def bench_custom_data_frame(rows):
+    return time_calls(lambda row: custom_data(row).get_data_as_data_frame(), rows)
+
+
+def bench_predict_cold(rows):
+    def cold(row):
+        PredictPipeline(registry=ModelRegistry()).predict(custom_data(row).get_data_as_data_frame())
+    return time_calls(cold, rows)
+
+
+def bench_predict_warm(rows):
+    pipeline = PredictPipeline(registry=ModelRegistry())
+    pipeline.registry.get()
+    frames = [custom_data(row).get_data_as_data_frame() for row in rows]
+    return time_calls(pipeline.predict, frames)
+
+
+def bench_predict_rows_warm(rows):
+    pipeline = PredictPipeline(registry=ModelRegistry(), cache=PredictionCache(PredictionCacheConfig(max_size=0)))
+    pipeline.registry.get()
+    return time_calls(lambda row: pipeline.predict_rows([row]), rows)
+
+
+def form_data(row):
+    # The form's field names, see templates/home.html
+    return {
+        "gender": row["gender"],
+        "ethnicity": row["race_ethnicity"],
+        "parental_level_of_education": row["parental_level_of_education"],
+        "lunch": row["lunch"],
+        "test_preparation_course": row["test_preparation_course"],
+        "reading_score": str(row["reading_score"]),
+        "writing_score": str(row["writing_score"]),
+    }
+
+
+def bench_route(rows, concurrency):
+    from app import app
+
+    forms = [form_data(row) for row in rows]
+    latencies = [[] for _ in range(concurrency)]
+    errors = []
+
+    def worker(index):
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session["logged_in"] = True
+        for form in forms[index::concurrency]:
+            t0 = time.perf_counter()
+            response = client.post("/predictdata", data=form)
+            latencies[index].append(time.perf_counter() - t0)
+            if response.status_code != 200:
+                errors.append(response.status_code)
+
+    # One untimed request loads the model and the database
+    worker_threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    warm_client = app.test_client()
+    with warm_client.session_transaction() as session:
+        session["logged_in"] = True
+    warm_client.post("/predictdata", data=forms[0])
+
+    start = time.perf_counter()
+    for thread in worker_threads:
+        thread.start()
+    for thread in worker_threads:
+        thread.join()
+    wall_time = time.perf_counter() - start
+
+    result = summarize([latency for per_thread in latencies for latency in per_thread], wall_time)
+    result["concurrency"] = concurrency
+    result["errors"] = len(errors)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500, help="calls per warm layer and per concurrency level")
+    parser.add_argument("--cold-requests", type=int, default=20, help="calls for the cold predict layer")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    args = parser.parse_args()
+
+    rows = sample_rows(args.requests, args.seed)
+
+    with tempfile.TemporaryDirectory() as db_dir, contextlib.redirect_stdout(sys.stderr):
+        # The route benchmark creates its users and sessions here, not in users.db
+        database.DATABASE_FILE = os.path.join(db_dir, "users.db")
+        report = build_report(args, rows)
+        # Write buffered session updates before the directory goes away
+        database.flush_write_behind()
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as file_obj:
+            file_obj.write(text + "\n")
+
+
+def build_report(args, rows):
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "requests": args.requests,
+        "seed": args.seed,
+        "layers": {
+            "custom_data_frame": bench_custom_data_frame(rows),
+            "predict_cold": bench_predict_cold(rows[:args.cold_requests]),
+            "predict_warm": bench_predict_warm(rows),
+            "predict_rows_warm": bench_predict_rows_warm(rows),
+            "route_predictdata": [bench_route(rows, level) for level in args.concurrency],
+        },
+    }
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+"""
+Cold-start benchmark.
+
+Every measurement runs in a fresh interpreter, the way a new gunicorn worker
+starts: it reports the import time of each serving-path module and, for the
+modules that can serve a prediction, the time from interpreter start to the
+first prediction. Results are printed as JSON.
+
+    python benchmarks/startup_benchmark.py --repeat 5 --budget 0.5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_MODULES = [
+    "flask",
+    "numpy",
+    "pandas",
+    "sklearn",
+    "authlib.integrations.flask_client",
+    "database",
+    "src.logger",
+    "src.utils",
+    "src.pipeline.model_registry",
+    "src.pipeline.predict_pipeline",
+    "app",
+]
+
+SAMPLE_ROW = {
+    "gender": "female",
+    "race_ethnicity": "group B",
+    "parental_level_of_education": "bachelor's degree",
+    "lunch": "standard",
+    "test_preparation_course": "completed",
+    "reading_score": 85,
+    "writing_score": 88,
+}
+
+IMPORT_SNIPPET = """
+import time
+start = time.perf_counter()
+import {module}
+print(time.perf_counter() - start)
+"""
+
+# Time is measured from interpreter start, so the import of the entry point is included
+FIRST_PREDICTION_SNIPPETS = {
+    "src.pipeline.predict_pipeline": """
+import time
+start = time.perf_counter()
+from src.pipeline.predict_pipeline import PredictPipeline
+PredictPipeline().predict_rows([{row!r}])
+print(time.perf_counter() - start)
+""",
+    "app": """
+import time
+start = time.perf_counter()
+from app import app
+client = app.test_client()
+with client.session_transaction() as session:
+    session['logged_in'] = True
+response = client.post('/api/predict', json={row!r})
+assert response.status_code == 200, response.get_data(as_text=True)
+print(time.perf_counter() - start)
+""",
+}
+
+
+def run_snippet(code):
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=PROJECT_ROOT,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr else "benchmark failed")
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def summarize(samples):
+    return {
+        "min_s": min(samples),
+        "median_s": statistics.median(samples),
+        "max_s": max(samples),
+        "samples": len(samples),
+    }
+
+
+def measure(code, repeat):
+    try:
+        return summarize([run_snippet(code) for _ in range(repeat)])
+    except RuntimeError as e:
+        return {"error": str(e)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=3, help="fresh interpreters per measurement")
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    parser.add_argument("--budget", type=float, help="fail if the median import time of app exceeds this many seconds")
+    args = parser.parse_args()
+
+    report = {
+        "python": sys.version.split()[0],
+        "import": {module: measure(IMPORT_SNIPPET.format(module=module), args.repeat) for module in IMPORT_MODULES},
+        "first_prediction": {
+            module: measure(snippet.format(row=SAMPLE_ROW), args.repeat)
+            for module, snippet in FIRST_PREDICTION_SNIPPETS.items()
+        },
+    }
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as file_obj:
+            file_obj.write(text + "\n")
+
+    if args.budget is not None:
+        app_import = report["import"]["app"].get("median_s")
+        if app_import is None or app_import > args.budget:
+            print(f"app import time {app_import} exceeds the {args.budget}s budget", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
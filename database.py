@@ -1,19 +1,97 @@
+import atexit
 import sqlite3
 import hashlib
 import os
-from datetime import datetime
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
 
 DATABASE_FILE = 'users.db'
 
+# WAL lets readers run alongside the single writer; synchronous=NORMAL only
+# fsyncs at checkpoints, which is durable against application crashes in WAL mode
+SQLITE_PRAGMAS = (
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA cache_size=-16000',
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA busy_timeout=5000',
+)
+
+# Prepared statements are cached per connection by SQL text, so every query
+# is a module constant and the pooled connections reuse them
+SQL_USER_BY_USERNAME = 'SELECT * FROM users WHERE username = ?'
+SQL_USER_BY_EMAIL = 'SELECT * FROM users WHERE email = ?'
+SQL_INSERT_USER = 'INSERT INTO users (username, email, password_hash, google_auth) VALUES (?, ?, ?, ?)'
+SQL_SET_LAST_LOGIN = 'UPDATE users SET last_login = ? WHERE id = ?'
+SQL_ALL_USERS = 'SELECT id, username, email, created_at, last_login FROM users'
+SQL_DELETE_USER = 'DELETE FROM users WHERE username = ?'
+SQL_SAVE_SESSION = '''
+    INSERT INTO user_sessions (user_id, session_token, expires_at, data) VALUES (?, ?, ?, ?)
+    ON CONFLICT (session_token) DO UPDATE SET
+        user_id = excluded.user_id, expires_at = excluded.expires_at, data = excluded.data
+'''
+SQL_SESSION_BY_TOKEN = 'SELECT user_id, expires_at, data FROM user_sessions WHERE session_token = ? AND expires_at > ?'
+SQL_TOUCH_SESSION = 'UPDATE user_sessions SET expires_at = ? WHERE session_token = ?'
+SQL_DELETE_SESSION = 'DELETE FROM user_sessions WHERE session_token = ?'
+SQL_DELETE_USER_SESSIONS = 'DELETE FROM user_sessions WHERE user_id = ?'
+SQL_DELETE_EXPIRED_SESSIONS = 'DELETE FROM user_sessions WHERE expires_at <= ?'
+SQL_USERS_PAGE = '''
+    SELECT id, username, email, password_hash, google_auth, created_at, last_login
+    FROM users WHERE id > ? ORDER BY id LIMIT ?
+'''
+
+# Keeps IN (...) lookups under SQLite's bound-parameter limit on old builds
+SQLITE_MAX_IN_PARAMS = 500
+
+# Buffered last_login updates are written at least this often, or as soon as
+# this many users are pending
+LAST_LOGIN_FLUSH_INTERVAL = 1.0
+LAST_LOGIN_MAX_PENDING = 500
+
+# User rows are served from memory for this many seconds; other processes'
+# changes (e.g. manage_db.py deleting a user) become visible after at most this long
+USER_CACHE_TTL = 60.0
+USER_CACHE_MAX_SIZE = 10000
+
+# Session expiry extensions are batched like last_login updates
+SESSION_TOUCH_FLUSH_INTERVAL = 5.0
+SESSION_TOUCH_MAX_PENDING = 1000
+
+_local = threading.local()
+
 def get_db_connection():
-    """Create a database connection"""
-    conn = sqlite3.connect(DATABASE_FILE)
+    """Create a new database connection with the tuned pragmas"""
+    conn = sqlite3.connect(DATABASE_FILE, timeout=5, cached_statements=256)
     conn.row_factory = sqlite3.Row
+    for pragma in SQLITE_PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+def get_connection():
+    """Return this thread's pooled connection, opening it on first use.
+
+    Connections are never shared between threads, and a forked worker opens
+    its own instead of reusing one inherited from the parent process.
+    """
+    conn = getattr(_local, 'conn', None)
+    if conn is None or _local.owner != (os.getpid(), DATABASE_FILE):
+        conn = get_db_connection()
+        _local.conn = conn
+        _local.owner = (os.getpid(), DATABASE_FILE)
     return conn
 
+def close_connection():
+    """Close this thread's pooled connection, if it has one"""
+    conn = getattr(_local, 'conn', None)
+    if conn is not None and _local.owner[0] == os.getpid():
+        conn.close()
+    _local.conn = None
+
 def init_db():
     """Initialize the database with required tables"""
-    conn = get_db_connection()
+    conn = get_connection()
     cursor = conn.cursor()
     
     # Create users table
@@ -40,9 +118,16 @@ def init_db():
             FOREIGN KEY (user_id) REFERENCES users (id)
         )
     ''')
+
+    # Server-side sessions keep the session payload next to the token
+    session_columns = [row['name'] for row in cursor.execute('PRAGMA table_info(user_sessions)')]
+    if 'data' not in session_columns:
+        cursor.execute('ALTER TABLE user_sessions ADD COLUMN data TEXT')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_user_sessions_user_id ON user_sessions (user_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_user_sessions_expires_at ON user_sessions (expires_at)')
     
     # Create admin user if it doesn't exist
-    cursor.execute('SELECT * FROM users WHERE username = ?', ('admin',))
+    cursor.execute(SQL_USER_BY_USERNAME, ('admin',))
     if not cursor.fetchone():
         admin_password_hash = hash_password('admin123')
         cursor.execute('''
@@ -51,7 +136,6 @@ def init_db():
         ''', ('admin', 'admin@example.com', admin_password_hash))
     
     conn.commit()
-    conn.close()
     print("Database initialized successfully!")
 
 def hash_password(password):
@@ -62,23 +146,91 @@ def verify_password(password, password_hash):
     """Verify a password against its hash"""
     return hash_password(password) == password_hash
 
+class UserCache:
+    """In-process cache of user rows, reachable by id, username or email.
+
+    Entries expire ttl seconds after they were loaded and the least recently
+    used one is evicted beyond max_size. This process's create_user and
+    delete_user invalidate the affected entries.
+    """
+
+    def __init__(self, ttl=USER_CACHE_TTL, max_size=USER_CACHE_MAX_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._index = {'username': {}, 'email': {}}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, field, value):
+        """Return the cached row whose field equals value, or None"""
+        with self._lock:
+            user_id = value if field == 'id' else self._index[field].get(value)
+            entry = self._entries.get(user_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, user = entry
+            if expires_at <= time.monotonic():
+                self._remove(user_id)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return user
+
+    def put(self, user):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._remove(user['id'])
+            self._entries[user['id']] = (time.monotonic() + self.ttl, user)
+            self._index['username'][user['username']] = user['id']
+            self._index['email'][user['email']] = user['id']
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, field, value):
+        with self._lock:
+            user_id = value if field == 'id' else self._index[field].get(value)
+            self._remove(user_id)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            for index in self._index.values():
+                index.clear()
+
+    def _remove(self, user_id):
+        entry = self._entries.pop(user_id, None)
+        if entry is not None:
+            user = entry[1]
+            self._index['username'].pop(user['username'], None)
+            self._index['email'].pop(user['email'], None)
+
+_user_cache = UserCache()
+
+def _get_user(field, value, sql):
+    user = _user_cache.get(field, value)
+    if user is None:
+        user = get_connection().execute(sql, (value,)).fetchone()
+        if user is not None:
+            _user_cache.put(user)
+    return user
+
 def create_user(username, email, password, google_auth=False):
     """Create a new user in the database"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    conn = get_connection()
     
     try:
         password_hash = hash_password(password) if password else None
-        cursor.execute('''
-            INSERT INTO users (username, email, password_hash, google_auth)
-            VALUES (?, ?, ?, ?)
-        ''', (username, email, password_hash, google_auth))
-        conn.commit()
-        user_id = cursor.lastrowid
-        conn.close()
-        return True, user_id
+        with conn:
+            cursor = conn.execute(SQL_INSERT_USER, (username, email, password_hash, google_auth))
+        _user_cache.invalidate('username', username)
+        _user_cache.invalidate('email', email)
+        return True, cursor.lastrowid
     except sqlite3.IntegrityError as e:
-        conn.close()
         if 'username' in str(e):
             return False, 'Username already exists'
         elif 'email' in str(e):
@@ -87,21 +239,11 @@ def create_user(username, email, password, google_auth=False):
 
 def get_user_by_username(username):
     """Get user by username"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM users WHERE username = ?', (username,))
-    user = cursor.fetchone()
-    conn.close()
-    return user
+    return _get_user('username', username, SQL_USER_BY_USERNAME)
 
 def get_user_by_email(email):
     """Get user by email"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM users WHERE email = ?', (email,))
-    user = cursor.fetchone()
-    conn.close()
-    return user
+    return _get_user('email', email, SQL_USER_BY_EMAIL)
 
 def authenticate_user(username, password):
     """Authenticate a user with username and password"""
@@ -113,35 +255,292 @@ def authenticate_user(username, password):
     return False, None
 
 def update_last_login(user_id):
-    """Update the last login timestamp for a user"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-        UPDATE users 
-        SET last_login = CURRENT_TIMESTAMP
-        WHERE id = ?
-    ''', (user_id,))
-    conn.commit()
-    conn.close()
+    """Record a login for user_id now; the last-login writer stores it in its next batch"""
+    get_last_login_writer().record(user_id)
+
+def utc_timestamp(offset_seconds=0):
+    """Current UTC time (plus offset) in CURRENT_TIMESTAMP's format"""
+    return datetime.fromtimestamp(time.time() + offset_seconds, timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+class WriteBehindBuffer:
+    """Coalesces keyed updates in memory and writes them behind.
+
+    record(key, value) keeps only the latest value per key; a background
+    thread runs sql as one executemany transaction over (value, key) pairs
+    every flush_interval seconds, sooner once max_pending keys are waiting,
+    and once more when the process exits.
+    """
+
+    def __init__(self, sql, flush_interval, max_pending, name):
+        self.sql = sql
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.name = name
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._pid = None
+
+    def record(self, key, value):
+        with self._lock:
+            self._ensure_thread()
+            self._pending[key] = value
+            pending = len(self._pending)
+        if pending >= self.max_pending:
+            self._wakeup.set()
+
+    def discard(self, key):
+        """Drop a buffered update, e.g. for a row that was just deleted"""
+        with self._lock:
+            self._pending.pop(key, None)
+
+    def flush(self):
+        """Write every buffered update now; returns the number of keys written"""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+            if not batch:
+                return 0
+            try:
+                conn = get_connection()
+                with conn:
+                    conn.executemany(self.sql, [(value, key) for key, value in batch.items()])
+            except sqlite3.Error:
+                # Put the batch back unless a newer value for the same key arrived meanwhile
+                with self._lock:
+                    for key, value in batch.items():
+                        self._pending.setdefault(key, value)
+                raise
+            return len(batch)
+
+    def _ensure_thread(self):
+        # Called with self._lock held; a forked worker starts its own thread
+        # and drops updates buffered by the parent, which the parent writes itself
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._pending = {}
+        threading.Thread(target=self._run, name=self.name, daemon=True).start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                print(f"Flushing {self.name} failed, will retry: {e}")
+
+class LastLoginWriter(WriteBehindBuffer):
+    """Write-behind buffer for last_login updates, coalesced per user"""
+
+    def __init__(self, flush_interval=LAST_LOGIN_FLUSH_INTERVAL, max_pending=LAST_LOGIN_MAX_PENDING):
+        super().__init__(SQL_SET_LAST_LOGIN, flush_interval, max_pending, name='last-login-writer')
+
+    def record(self, user_id):
+        """Buffer a login for user_id at the current time"""
+        super().record(user_id, utc_timestamp())
+
+_write_behind_lock = threading.Lock()
+_last_login_writer = None
+_session_touch_writer = None
+
+def _register_write_behind(buffer):
+    # Called with _write_behind_lock held
+    if _last_login_writer is None and _session_touch_writer is None:
+        atexit.register(flush_write_behind)
+    return buffer
+
+def get_last_login_writer():
+    """Process-wide LastLoginWriter, flushed at interpreter exit"""
+    global _last_login_writer
+    if _last_login_writer is None:
+        with _write_behind_lock:
+            if _last_login_writer is None:
+                _last_login_writer = _register_write_behind(LastLoginWriter())
+    return _last_login_writer
+
+def get_session_touch_writer():
+    """Process-wide buffer of session expiry extensions, keyed by session token"""
+    global _session_touch_writer
+    if _session_touch_writer is None:
+        with _write_behind_lock:
+            if _session_touch_writer is None:
+                _session_touch_writer = _register_write_behind(WriteBehindBuffer(
+                    SQL_TOUCH_SESSION, SESSION_TOUCH_FLUSH_INTERVAL, SESSION_TOUCH_MAX_PENDING,
+                    name='session-touch-writer'
+                ))
+    return _session_touch_writer
+
+def flush_last_logins():
+    """Write any buffered last_login updates"""
+    if _last_login_writer is not None:
+        return _last_login_writer.flush()
+    return 0
+
+def flush_write_behind():
+    """Write every buffered update (last_login and session expiry)"""
+    written = flush_last_logins()
+    if _session_touch_writer is not None:
+        written += _session_touch_writer.flush()
+    return written
 
 def get_all_users():
     """Get all users from the database"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT id, username, email, created_at, last_login FROM users')
-    users = cursor.fetchall()
-    conn.close()
+    users = get_connection().execute(SQL_ALL_USERS).fetchall()
     return [dict(user) for user in users]
 
+def iter_users(page_size=1000, after_id=0, include_password_hash=False):
+    """Yield every user as a dict in id order, one keyset-paginated page at a time"""
+    conn = get_connection()
+    while True:
+        page = conn.execute(SQL_USERS_PAGE, (after_id, page_size)).fetchall()
+        for user in page:
+            user = dict(user)
+            if not include_password_hash:
+                del user['password_hash']
+            yield user
+        if len(page) < page_size:
+            return
+        after_id = page[-1]['id']
+
+def _existing_values(conn, column, values):
+    found = set()
+    values = list(values)
+    for start in range(0, len(values), SQLITE_MAX_IN_PARAMS):
+        part = values[start:start + SQLITE_MAX_IN_PARAMS]
+        placeholders = ', '.join('?' * len(part))
+        found.update(row[0] for row in conn.execute(
+            f'SELECT {column} FROM users WHERE {column} IN ({placeholders})', part
+        ))
+    return found
+
+def _insert_user_chunk(conn, chunk, on_conflict):
+    existing_usernames = _existing_values(conn, 'username', {user['username'] for _, user in chunk})
+    existing_emails = _existing_values(conn, 'email', {user['email'] for _, user in chunk})
+
+    rows = []
+    for position, user in chunk:
+        if user['username'] in existing_usernames:
+            on_conflict(position, user, 'Username already exists')
+        elif user['email'] in existing_emails:
+            on_conflict(position, user, 'Email already exists')
+        else:
+            # Later duplicates inside the same chunk conflict with this row
+            existing_usernames.add(user['username'])
+            existing_emails.add(user['email'])
+            rows.append((position, user))
+
+    try:
+        with conn:
+            conn.executemany(SQL_INSERT_USER, [
+                (user['username'], user['email'], user['password_hash'], user['google_auth']) for _, user in rows
+            ])
+        return len(rows)
+    except sqlite3.IntegrityError:
+        pass
+
+    # Another writer inserted a clashing user meanwhile: fall back to row by row
+    inserted = 0
+    for position, user in rows:
+        try:
+            with conn:
+                conn.execute(SQL_INSERT_USER, (user['username'], user['email'], user['password_hash'], user['google_auth']))
+            inserted += 1
+        except sqlite3.IntegrityError as e:
+            on_conflict(position, user, 'Username already exists' if 'username' in str(e) else 'Email already exists')
+    return inserted
+
+def bulk_create_users(users, chunk_size=1000, on_conflict=None):
+    """Insert users from an iterable of dicts, chunk_size rows per transaction.
+
+    Each dict needs username and email, plus password (hashed here) or an
+    already hashed password_hash, and optionally google_auth. Rows that are
+    incomplete or clash with an existing or earlier user are skipped and
+    passed to on_conflict(position, user, reason), position counting from 1.
+    Returns (inserted, skipped).
+    """
+    conn = get_connection()
+    inserted = 0
+    skipped = 0
+
+    def conflict(position, user, reason):
+        nonlocal skipped
+        skipped += 1
+        if on_conflict is not None:
+            on_conflict(position, user, reason)
+
+    chunk = []
+    for position, user in enumerate(users, start=1):
+        username = (user.get('username') or '').strip()
+        email = (user.get('email') or '').strip()
+        if not username or not email:
+            conflict(position, user, 'Username and email are required')
+            continue
+        password = user.get('password')
+        chunk.append((position, {
+            'username': username,
+            'email': email,
+            'password_hash': hash_password(password) if password else (user.get('password_hash') or None),
+            'google_auth': str(user.get('google_auth', '')).strip().lower() in ('1', 'true', 'yes'),
+        }))
+        if len(chunk) >= chunk_size:
+            inserted += _insert_user_chunk(conn, chunk, conflict)
+            chunk = []
+    if chunk:
+        inserted += _insert_user_chunk(conn, chunk, conflict)
+
+    return inserted, skipped
+
 def delete_user(username):
-    """Delete a user by username"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('DELETE FROM users WHERE username = ?', (username,))
-    conn.commit()
-    rows_affected = cursor.rowcount
-    conn.close()
-    return rows_affected > 0
+    """Delete a user by username, revoking their sessions"""
+    conn = get_connection()
+    with conn:
+        conn.execute(
+            'DELETE FROM user_sessions WHERE user_id IN (SELECT id FROM users WHERE username = ?)', (username,)
+        )
+        cursor = conn.execute(SQL_DELETE_USER, (username,))
+    _user_cache.invalidate('username', username)
+    return cursor.rowcount > 0
+
+def save_session_record(token, user_id, expires_at, data):
+    """Insert or replace a server-side session"""
+    conn = get_connection()
+    with conn:
+        conn.execute(SQL_SAVE_SESSION, (user_id, token, expires_at, data))
+
+def get_session_record(token):
+    """Return the unexpired session row (user_id, expires_at, data) for token, or None"""
+    return get_connection().execute(SQL_SESSION_BY_TOKEN, (token, utc_timestamp())).fetchone()
+
+def delete_session_record(token):
+    conn = get_connection()
+    with conn:
+        conn.execute(SQL_DELETE_SESSION, (token,))
+    if _session_touch_writer is not None:
+        _session_touch_writer.discard(token)
+
+def delete_user_sessions(user_id):
+    """Revoke every session of a user; returns how many were deleted"""
+    conn = get_connection()
+    with conn:
+        cursor = conn.execute(SQL_DELETE_USER_SESSIONS, (user_id,))
+    return cursor.rowcount
+
+def delete_all_sessions():
+    """Revoke every session; returns how many were deleted"""
+    conn = get_connection()
+    with conn:
+        cursor = conn.execute('DELETE FROM user_sessions')
+    return cursor.rowcount
+
+def delete_expired_sessions():
+    """Delete every expired session in one statement; returns how many"""
+    conn = get_connection()
+    with conn:
+        cursor = conn.execute(SQL_DELETE_EXPIRED_SESSIONS, (utc_timestamp(),))
+    return cursor.rowcount
 
 if __name__ == '__main__':
     # Initialize the database when run directly
@@ -0,0 +1,39 @@
+"""
+Gunicorn settings for serving app.py with the model preloaded before fork.
+
+    gunicorn -c gunicorn.conf.py app:app
+
+The master imports app with PRELOAD_APP=1, which initialises the database and
+loads/warms the model artifacts once. Workers are forked afterwards and share
+those pages copy-on-write; the array artifacts (compact model, compiled
+preprocessor, prediction table) are memory-mapped read-only, so they stay
+shared even after a worker touches them.
+"""
+import gc
+import multiprocessing
+import os
+
+os.environ.setdefault("PRELOAD_APP", "1")
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.getenv("GUNICORN_WORKERS", multiprocessing.cpu_count()))
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+preload_app = os.environ["PRELOAD_APP"] == "1"
+
+
+def pre_fork(server, worker):
+    # The master's connection from init_db must not be carried across fork,
+    # each worker opens its own on first use
+    from database import close_connection
+    close_connection()
+
+    # Move everything loaded so far into the permanent generation so the
+    # cyclic GC in the workers never writes to (and un-shares) those pages
+    gc.freeze()
+
+
+def worker_exit(server, worker):
+    # Write the last_login and session expiry updates this worker still has buffered
+    from database import close_connection, flush_write_behind
+    flush_write_behind()
+    close_connection()
@@ -2,40 +2,138 @@
 """
 Database Management Script
 Use this script to view and manage users in the database
+
+Every command also runs non-interactively, e.g.:
+
+    python manage_db.py list --page-size 5000
+    python manage_db.py export users.jsonl
+    python manage_db.py import new_users.csv --conflicts conflicts.csv
+    python manage_db.py add --username alice --email alice@example.com --password secret
+    python manage_db.py delete --username alice --yes
+    python manage_db.py revoke-sessions --username alice
 """
 
 from database import (
-    get_all_users, 
+    iter_users,
+    bulk_create_users,
+    delete_user_sessions,
+    delete_all_sessions,
     create_user, 
     delete_user, 
     get_user_by_username,
     authenticate_user
 )
+import argparse
+import csv
+import json
 import sys
 
-def display_all_users():
-    """Display all users in the database"""
-    users = get_all_users()
-    if not users:
+EXPORT_FIELDS = ['id', 'username', 'email', 'google_auth', 'created_at', 'last_login']
+
+def display_all_users(page_size=1000):
+    """Display all users in the database, streamed page by page"""
+    total = 0
+    for user in iter_users(page_size=page_size):
+        if total == 0:
+            print("\n" + "="*80)
+            print(f"{'ID':<5} {'Username':<20} {'Email':<30} {'Created At':<20}")
+            print("="*80)
+        print(f"{user['id']:<5} {user['username']:<20} {user['email']:<30} {str(user['created_at']):<20}")
+        total += 1
+
+    if total == 0:
         print("No users found in the database.")
         return
     
-    print("\n" + "="*80)
-    print(f"{'ID':<5} {'Username':<20} {'Email':<30} {'Created At':<20}")
     print("="*80)
-    
-    for user in users:
-        print(f"{user['id']:<5} {user['username']:<20} {user['email']:<30} {str(user['created_at']):<20}")
-    
-    print("="*80)
-    print(f"Total users: {len(users)}\n")
+    print(f"Total users: {total}\n")
+
+def file_format(path, fmt=None):
+    """csv or jsonl, from --format or the file extension"""
+    if fmt:
+        return fmt
+    return 'jsonl' if path.endswith(('.jsonl', '.ndjson', '.json')) else 'csv'
+
+def open_file(path, mode):
+    if path == '-':
+        return open(sys.stdout.fileno() if 'w' in mode else sys.stdin.fileno(), mode, newline='', closefd=False)
+    return open(path, mode, newline='', encoding='utf-8')
+
+def export_users(path, fmt=None, include_password_hash=False, page_size=1000):
+    """Stream every user to a CSV or JSONL file ('-' for stdout)"""
+    fmt = file_format(path, fmt)
+    fields = EXPORT_FIELDS + (['password_hash'] if include_password_hash else [])
+    count = 0
+    with open_file(path, 'w') as file_obj:
+        writer = csv.DictWriter(file_obj, fieldnames=fields) if fmt == 'csv' else None
+        if writer:
+            writer.writeheader()
+        for user in iter_users(page_size=page_size, include_password_hash=include_password_hash):
+            row = {field: user[field] for field in fields}
+            if writer:
+                writer.writerow(row)
+            else:
+                file_obj.write(json.dumps(row) + "\n")
+            count += 1
+    print(f"Exported {count} users", file=sys.stderr)
+    return count
+
+def read_users(file_obj, fmt):
+    if fmt == 'csv':
+        yield from csv.DictReader(file_obj)
+        return
+    for line in file_obj:
+        if line.strip():
+            yield json.loads(line)
+
+def import_users(path, fmt=None, chunk_size=1000, conflicts_path=None):
+    """Bulk-insert users from a CSV or JSONL file ('-' for stdin).
+
+    Rows need username and email plus password or password_hash; the columns
+    written by export are accepted as they are. Rows that clash with existing
+    users are skipped and reported (also to conflicts_path as CSV if given).
+    """
+    fmt = file_format(path, fmt)
+    conflicts_file = open(conflicts_path, 'w', newline='', encoding='utf-8') if conflicts_path else None
+    conflicts_writer = None
+    if conflicts_file:
+        conflicts_writer = csv.writer(conflicts_file)
+        conflicts_writer.writerow(['row', 'username', 'email', 'reason'])
+
+    def report(position, user, reason):
+        print(f"row {position}: {user.get('username')!r} <{user.get('email')}>: {reason}", file=sys.stderr)
+        if conflicts_writer:
+            conflicts_writer.writerow([position, user.get('username'), user.get('email'), reason])
+
+    try:
+        with open_file(path, 'r') as file_obj:
+            inserted, skipped = bulk_create_users(read_users(file_obj, fmt), chunk_size=chunk_size, on_conflict=report)
+    finally:
+        if conflicts_file:
+            conflicts_file.close()
+
+    print(f"Imported {inserted} users, skipped {skipped}", file=sys.stderr)
+    return inserted, skipped
 
-def add_user():
+def revoke_sessions(username=None, all_sessions=False):
+    """Log a user (or everyone) out by deleting their server-side sessions"""
+    if all_sessions:
+        count = delete_all_sessions()
+    else:
+        user = get_user_by_username(username)
+        if not user:
+            print(f"Error: User '{username}' not found!")
+            return
+        count = delete_user_sessions(user['id'])
+    # Running app workers notice within their session cache TTL
+    print(f"Revoked {count} sessions.")
+
+def add_user(username=None, email=None, password=None):
     """Add a new user to the database"""
     print("\n--- Add New User ---")
-    username = input("Enter username: ").strip()
-    email = input("Enter email: ").strip()
-    password = input("Enter password: ").strip()
+    username = (username or input("Enter username: ")).strip()
+    email = (email or input("Enter email: ")).strip()
+    password = (password or input("Enter password: ")).strip()
     
     if not username or not email or not password:
         print("Error: All fields are required!")
@@ -48,10 +146,10 @@ def add_user():
     else:
         print(f"Error: {result}")
 
-def remove_user():
+def remove_user(username=None, assume_yes=False):
     """Remove a user from the database"""
     print("\n--- Delete User ---")
-    username = input("Enter username to delete: ").strip()
+    username = (username or input("Enter username to delete: ")).strip()
     
     if not username:
         print("Error: Username is required!")
@@ -63,7 +161,7 @@ def remove_user():
         print(f"Error: User '{username}' not found!")
         return
     
-    confirm = input(f"Are you sure you want to delete user '{username}'? (yes/no): ").strip().lower()
+    confirm = 'yes' if assume_yes else input(f"Are you sure you want to delete user '{username}'? (yes/no): ").strip().lower()
     
     if confirm == 'yes':
         if delete_user(username):
@@ -73,11 +171,11 @@ def remove_user():
     else:
         print("Deletion cancelled.")
 
-def test_login():
+def test_login(username=None, password=None):
     """Test user authentication"""
     print("\n--- Test Login ---")
-    username = input("Enter username: ").strip()
-    password = input("Enter password: ").strip()
+    username = (username or input("Enter username: ")).strip()
+    password = (password or input("Enter password: ")).strip()
     
     success, user = authenticate_user(username, password)
     
@@ -89,10 +187,10 @@ def test_login():
     else:
         print("\n✗ Authentication failed! Invalid username or password.")
 
-def search_user():
+def search_user(username=None):
     """Search for a user"""
     print("\n--- Search User ---")
-    username = input("Enter username to search: ").strip()
+    username = (username or input("Enter username to search: ")).strip()
     
     user = get_user_by_username(username)
     
@@ -120,23 +218,64 @@ def show_menu():
     print("6. Exit")
     print("="*50)
 
+def build_parser():
+    """Command line interface; options left out are prompted for"""
+    parser = argparse.ArgumentParser(description="View and manage users in the database")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    list_parser = commands.add_parser('list', help='list all users')
+    list_parser.add_argument('--page-size', type=int, default=1000)
+    list_parser.set_defaults(run=lambda args: display_all_users(args.page_size))
+
+    export_parser = commands.add_parser('export', help='stream all users to CSV or JSONL')
+    export_parser.add_argument('path', help="output file, '-' for stdout")
+    export_parser.add_argument('--format', choices=['csv', 'jsonl'], help='default: from the file extension')
+    export_parser.add_argument('--include-password-hash', action='store_true')
+    export_parser.add_argument('--page-size', type=int, default=1000)
+    export_parser.set_defaults(run=lambda args: export_users(
+        args.path, args.format, args.include_password_hash, args.page_size
+    ))
+
+    import_parser = commands.add_parser('import', help='bulk-insert users from CSV or JSONL')
+    import_parser.add_argument('path', help="input file, '-' for stdin")
+    import_parser.add_argument('--format', choices=['csv', 'jsonl'], help='default: from the file extension')
+    import_parser.add_argument('--chunk-size', type=int, default=1000, help='rows per transaction')
+    import_parser.add_argument('--conflicts', help='also write skipped rows to this CSV file')
+    import_parser.set_defaults(run=lambda args: import_users(args.path, args.format, args.chunk_size, args.conflicts))
+
+    revoke_parser = commands.add_parser('revoke-sessions', help='log a user or everyone out')
+    revoke_target = revoke_parser.add_mutually_exclusive_group(required=True)
+    revoke_target.add_argument('--username')
+    revoke_target.add_argument('--all', action='store_true', dest='all_sessions')
+    revoke_parser.set_defaults(run=lambda args: revoke_sessions(args.username, args.all_sessions))
+
+    add_parser = commands.add_parser('add', help='add a user')
+    add_parser.add_argument('--username')
+    add_parser.add_argument('--email')
+    add_parser.add_argument('--password')
+    add_parser.set_defaults(run=lambda args: add_user(args.username, args.email, args.password))
+
+    delete_parser = commands.add_parser('delete', help='delete a user')
+    delete_parser.add_argument('--username')
+    delete_parser.add_argument('--yes', action='store_true', help='do not ask for confirmation')
+    delete_parser.set_defaults(run=lambda args: remove_user(args.username, args.yes))
+
+    search_parser = commands.add_parser('search', help='show one user')
+    search_parser.add_argument('--username')
+    search_parser.set_defaults(run=lambda args: search_user(args.username))
+
+    test_parser = commands.add_parser('test', help='test a login')
+    test_parser.add_argument('--username')
+    test_parser.add_argument('--password')
+    test_parser.set_defaults(run=lambda args: test_login(args.username, args.password))
+
+    return parser
+
 def main():
     """Main function"""
     if len(sys.argv) > 1:
-        command = sys.argv[1].lower()
-        if command == 'list':
-            display_all_users()
-        elif command == 'add':
-            add_user()
-        elif command == 'delete':
-            remove_user()
-        elif command == 'search':
-            search_user()
-        elif command == 'test':
-            test_login()
-        else:
-            print(f"Unknown command: {command}")
-            print("Usage: python manage_db.py [list|add|delete|search|test]")
+        args = build_parser().parse_args()
+        args.run(args)
         return
     
     # Interactive mode
@@ -0,0 +1,219 @@
+"""
+Server-side Flask sessions stored in the user_sessions table.
+
+Once a session belongs to a user (has a user_id) its payload lives in
+user_sessions and the cookie only carries an opaque token. Anonymous sessions
+(flash messages, OAuth state before login) stay in Flask's signed cookie.
+Lookups go through an in-process cache, expiry extensions are written behind
+in batches, and a background thread deletes expired rows.
+"""
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SecureCookieSession, SecureCookieSessionInterface, SessionInterface
+
+from database import (
+    delete_expired_sessions,
+    delete_session_record,
+    get_session_record,
+    get_session_touch_writer,
+    save_session_record,
+    utc_timestamp,
+)
+
+# Marks a server-side session token; ':' never occurs in a signed cookie session
+TOKEN_PREFIX = 'sid:'
+
+# Sessions are served from memory for this many seconds, so a revocation made
+# by another process (e.g. manage_db.py) takes effect after at most this long
+SESSION_CACHE_TTL = 30.0
+SESSION_CACHE_MAX_SIZE = 10000
+
+# A session's stored expiry is pushed forward at most once per this many seconds
+SESSION_TOUCH_INTERVAL = 300.0
+
+# How often expired rows are deleted
+SESSION_SWEEP_INTERVAL = 300.0
+
+def parse_timestamp(value):
+    """Epoch seconds of a CURRENT_TIMESTAMP-format UTC string"""
+    return datetime.strptime(value, '%Y-%m-%d %H:%M:%S').replace(tzinfo=timezone.utc).timestamp()
+
+class ServerSession(SecureCookieSession):
+    """Session whose payload is stored server-side under token"""
+
+    def __init__(self, initial=None, token=None):
+        super().__init__(initial)
+        self.token = token
+
+class SessionCache:
+    """LRU map of token -> [cached_until, user_id, expires_epoch, data] with a TTL"""
+
+    def __init__(self, ttl=SESSION_CACHE_TTL, max_size=SESSION_CACHE_MAX_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token):
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic() or entry[2] <= time.time():
+                del self._entries[token]
+                return None
+            self._entries.move_to_end(token)
+            return entry
+
+    def put(self, token, user_id, expires_epoch, data):
+        entry = [time.monotonic() + self.ttl, user_id, expires_epoch, data]
+        if self.max_size <= 0:
+            return entry
+        with self._lock:
+            self._entries[token] = entry
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return entry
+
+    def pop(self, token):
+        with self._lock:
+            self._entries.pop(token, None)
+
+    def remove_expired(self):
+        now = time.time()
+        with self._lock:
+            for token in [token for token, entry in self._entries.items() if entry[2] <= now]:
+                del self._entries[token]
+
+class SQLiteSessionInterface(SessionInterface):
+    """Flask session interface backed by user_sessions.
+
+    prepare, if given, is called before the first lookup of each request
+    (e.g. to make sure the database is initialized).
+    """
+
+    serializer = TaggedJSONSerializer()
+
+    def __init__(self, prepare=None, cache=None, touch_interval=SESSION_TOUCH_INTERVAL,
+                 sweep_interval=SESSION_SWEEP_INTERVAL):
+        self.prepare = prepare
+        self.cache = cache or SessionCache()
+        self.touch_interval = touch_interval
+        self.sweep_interval = sweep_interval
+        self.cookie_interface = SecureCookieSessionInterface()
+        self._sweeper_lock = threading.Lock()
+        self._sweeper_pid = None
+
+    def open_session(self, app, request):
+        value = request.cookies.get(self.get_cookie_name(app))
+        if not value or not value.startswith(TOKEN_PREFIX):
+            return self.cookie_interface.open_session(app, request)
+
+        if self.prepare is not None:
+            self.prepare()
+        self._ensure_sweeper()
+
+        token = value[len(TOKEN_PREFIX):]
+        entry = self.load(token)
+        if entry is None:
+            # Expired or revoked: start over with an empty session
+            return ServerSession()
+        return ServerSession(self.serializer.loads(entry[3]), token=token)
+
+    def save_session(self, app, session, response):
+        if session.get('user_id') is None:
+            if not isinstance(session, ServerSession):
+                return self.cookie_interface.save_session(app, session, response)
+            # Logged out: drop the stored session and keep whatever is left in the cookie
+            if session.token is not None:
+                self.revoke(session.token)
+            anonymous = SecureCookieSession(dict(session))
+            anonymous.modified = True
+            return self.cookie_interface.save_session(app, anonymous, response)
+
+        if session.accessed:
+            response.vary.add('Cookie')
+
+        lifetime = app.permanent_session_lifetime.total_seconds()
+        token = session.token if isinstance(session, ServerSession) else None
+        is_new = token is None
+        if is_new:
+            # A fresh token on every login, so a pre-login cookie can't be fixated
+            token = secrets.token_urlsafe(32)
+        if is_new or session.modified:
+            self.store(token, session['user_id'], lifetime, self.serializer.dumps(dict(session)))
+        else:
+            self.touch(token, lifetime)
+
+        if is_new or self.should_set_cookie(app, session):
+            response.set_cookie(
+                self.get_cookie_name(app),
+                TOKEN_PREFIX + token,
+                expires=self.get_expiration_time(app, session),
+                httponly=self.get_cookie_httponly(app),
+                domain=self.get_cookie_domain(app),
+                path=self.get_cookie_path(app),
+                secure=self.get_cookie_secure(app),
+                samesite=self.get_cookie_samesite(app),
+            )
+
+    def load(self, token):
+        """Cache entry for token, read from the table on a miss; None if there is no live session"""
+        entry = self.cache.get(token)
+        if entry is not None:
+            return entry
+        record = get_session_record(token)
+        if record is None:
+            return None
+        return self.cache.put(token, record['user_id'], parse_timestamp(record['expires_at']), record['data'])
+
+    def store(self, token, user_id, lifetime, data):
+        self._ensure_sweeper()
+        expires_at = utc_timestamp(lifetime)
+        save_session_record(token, user_id, expires_at, data)
+        self.cache.put(token, user_id, parse_timestamp(expires_at), data)
+
+    def touch(self, token, lifetime):
+        """Slide the expiry forward, buffered and at most once per touch_interval"""
+        entry = self.cache.get(token)
+        if entry is None or time.time() + lifetime - entry[2] < self.touch_interval:
+            return
+        expires_at = utc_timestamp(lifetime)
+        entry[2] = parse_timestamp(expires_at)
+        get_session_touch_writer().record(token, expires_at)
+
+    def revoke(self, token):
+        delete_session_record(token)
+        self.cache.pop(token)
+
+    def sweep(self):
+        """Delete expired sessions from the table and the cache"""
+        self.cache.remove_expired()
+        return delete_expired_sessions()
+
+    def _ensure_sweeper(self):
+        # One sweeper thread per process, started after any fork
+        if self._sweeper_pid == os.getpid():
+            return
+        with self._sweeper_lock:
+            if self._sweeper_pid == os.getpid():
+                return
+            self._sweeper_pid = os.getpid()
+            threading.Thread(target=self._sweep_forever, name='session-sweeper', daemon=True).start()
+
+    def _sweep_forever(self):
+        while True:
+            time.sleep(self.sweep_interval)
+            try:
+                removed = self.sweep()
+                if removed:
+                    print(f"Removed {removed} expired sessions")
+            except Exception as e:
+                print(f"Session sweep failed, will retry: {e}")
@@ -0,0 +1,243 @@
+import json
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+from src.exception import CustomException
+
+
+class CompactLinearModel:
+    '''
+    Coefficient vector and intercept of a fitted linear regressor.
+    '''
+    ## file_fingerprint of the model.pkl this was exported from and of the preprocessor it was trained with
+    source_fingerprint=None
+    preprocessor_fingerprint=None
+
+    def __init__(self, coef, intercept):
+        self.coef=np.asarray(coef, dtype=np.float64).ravel()
+        self.intercept=float(np.ravel(intercept)[0]) if np.ndim(intercept) else float(intercept)
+
+    def predict(self, X):
+        if hasattr(X, "toarray"):
+            X=X.toarray()
+        return np.asarray(X, dtype=np.float64)@self.coef+self.intercept
+
+
+class CompactTreeEnsemble:
+    '''
+    Tree ensemble flattened into parallel node arrays. Leaves point at
+    themselves, so walking every tree for max_depth steps lands each sample on
+    its leaf without per-tree Python loops. The ensemble output is
+    aggregate(leaf values) * scale + bias, with aggregate "sum" or "mean".
+    '''
+    source_fingerprint=None
+    preprocessor_fingerprint=None
+
+    def __init__(self, roots, feature, threshold, left, right, missing_left, value,
+                 max_depth, split_rule="le", aggregate="sum", scale=1.0, bias=0.0):
+        self.roots=np.asarray(roots, dtype=np.intp)
+        self.feature=np.asarray(feature, dtype=np.intp)
+        self.threshold=np.asarray(threshold, dtype=np.float64)
+        self.left=np.asarray(left, dtype=np.intp)
+        self.right=np.asarray(right, dtype=np.intp)
+        self.missing_left=np.asarray(missing_left, dtype=bool)
+        self.value=np.asarray(value, dtype=np.float64)
+        self.max_depth=int(max_depth)
+        ## "le" sends x <= threshold left (sklearn, CatBoost), "lt" sends x < threshold left (XGBoost)
+        self.split_rule=split_rule
+        self.aggregate=aggregate
+        self.scale=float(scale)
+        self.bias=float(bias)
+
+    def predict(self, X, batch_size=4096):
+        if hasattr(X, "toarray"):
+            X=X.toarray()
+        ## Every supported library compares float32 features
+        X=np.asarray(X, dtype=np.float32).astype(np.float64)
+
+        out=np.empty(X.shape[0], dtype=np.float64)
+        for start in range(0, X.shape[0], batch_size):
+            Xb=X[start:start+batch_size]
+            rows=np.arange(Xb.shape[0])[:, None]
+            node=np.broadcast_to(self.roots, (Xb.shape[0], len(self.roots))).copy()
+            for _ in range(self.max_depth):
+                x=Xb[rows, self.feature[node]]
+                if self.split_rule=="lt":
+                    go_left=x<self.threshold[node]
+                else:
+                    go_left=x<=self.threshold[node]
+                go_left=np.where(np.isnan(x), self.missing_left[node], go_left)
+                node=np.where(go_left, self.left[node], self.right[node])
+
+            leaves=self.value[node]
+            total=leaves.mean(axis=1) if self.aggregate=="mean" else leaves.sum(axis=1)
+            out[start:start+batch_size]=total*self.scale+self.bias
+        return out
+
+
+class _TreeBuilder:
+    '''
+    Accumulates trees into the flat arrays used by CompactTreeEnsemble.
+    '''
+    def __init__(self):
+        self.roots=[]
+        self.feature=[]
+        self.threshold=[]
+        self.left=[]
+        self.right=[]
+        self.missing_left=[]
+        self.value=[]
+        self.max_depth=0
+
+    def add_node(self, feature=0, threshold=0.0, missing_left=False, value=0.0):
+        index=len(self.feature)
+        self.feature.append(feature)
+        self.threshold.append(threshold)
+        self.left.append(index)
+        self.right.append(index)
+        self.missing_left.append(missing_left)
+        self.value.append(value)
+        return index
+
+    def build(self, **kwargs):
+        return CompactTreeEnsemble(
+            roots=self.roots,
+            feature=self.feature,
+            threshold=self.threshold,
+            left=self.left,
+            right=self.right,
+            missing_left=self.missing_left,
+            value=self.value,
+            max_depth=self.max_depth,
+            **kwargs,
+        )
+
+
+def _add_sklearn_tree(builder, tree, value_scale=1.0):
+    offset=len(builder.feature)
+    is_leaf=tree.children_left==-1
+    for i in range(tree.node_count):
+        builder.add_node(
+            feature=0 if is_leaf[i] else int(tree.feature[i]),
+            threshold=float(tree.threshold[i]),
+            value=float(tree.value[i].ravel()[0])*value_scale,
+        )
+        if not is_leaf[i]:
+            builder.left[offset+i]=offset+int(tree.children_left[i])
+            builder.right[offset+i]=offset+int(tree.children_right[i])
+    builder.roots.append(offset)
+    builder.max_depth=max(builder.max_depth, int(tree.max_depth))
+
+
+def _add_xgboost_tree(builder, tree_json):
+    def walk(node, depth):
+        if "leaf" in node:
+            builder.max_depth=max(builder.max_depth, depth)
+            return builder.add_node(value=float(np.float32(node["leaf"])))
+        index=builder.add_node(
+            feature=int(node["split"].lstrip("f")),
+            threshold=float(np.float32(node["split_condition"])),
+            missing_left=node["missing"]==node["yes"],
+        )
+        children={child["nodeid"]: child for child in node["children"]}
+        builder.left[index]=walk(children[node["yes"]], depth+1)
+        builder.right[index]=walk(children[node["no"]], depth+1)
+        return index
+
+    builder.roots.append(walk(json.loads(tree_json), 0))
+
+
+def _add_catboost_tree(builder, tree, flat_feature_index):
+    ## Oblivious tree: split d sets bit d of the leaf index when x > border.
+    ## Expanded into a full binary tree that tests the last split first.
+    splits=tree["splits"]
+    leaf_values=tree["leaf_values"]
+    depth=len(splits)
+
+    def expand(level, leaf_index):
+        if level<0:
+            return builder.add_node(value=float(leaf_values[leaf_index]))
+        split=splits[level]
+        index=builder.add_node(
+            feature=flat_feature_index[split["float_feature_index"]],
+            threshold=float(np.float32(split["border"])),
+        )
+        builder.left[index]=expand(level-1, leaf_index)
+        builder.right[index]=expand(level-1, leaf_index|(1<<level))
+        return index
+
+    builder.roots.append(expand(depth-1, 0))
+    builder.max_depth=max(builder.max_depth, depth)
+
+
+def _xgboost_base_score(booster):
+    params=json.loads(booster.save_config())["learner"]["learner_model_param"]
+    return float(params["base_score"].strip("[]"))
+
+
+def export_compact_model(model):
+    '''
+    Flattens a fitted estimator into a CompactLinearModel or
+    CompactTreeEnsemble. Returns None for estimators without a compact form
+    (e.g. KNN, AdaBoost's weighted median).
+    '''
+    try:
+        name=type(model).__name__
+
+        if name in ("LinearRegression", "Ridge", "Lasso", "ElasticNet"):
+            return CompactLinearModel(model.coef_, model.intercept_)
+
+        if name=="DecisionTreeRegressor":
+            builder=_TreeBuilder()
+            _add_sklearn_tree(builder, model.tree_)
+            return builder.build(aggregate="sum")
+
+        if name=="RandomForestRegressor":
+            builder=_TreeBuilder()
+            for estimator in model.estimators_:
+                _add_sklearn_tree(builder, estimator.tree_)
+            return builder.build(aggregate="mean")
+
+        if name=="GradientBoostingRegressor":
+            if not hasattr(model.init_, "constant_"):
+                return None
+            builder=_TreeBuilder()
+            for estimator in model.estimators_[:, 0]:
+                _add_sklearn_tree(builder, estimator.tree_, value_scale=model.learning_rate)
+            return builder.build(aggregate="sum", bias=float(np.ravel(model.init_.constant_)[0]))
+
+        if name=="XGBRegressor":
+            booster=model.get_booster()
+            trees=booster.get_dump(dump_format="json")
+            best_iteration=booster.attr("best_iteration")
+            if best_iteration is not None:
+                trees=trees[:int(best_iteration)+1]
+            builder=_TreeBuilder()
+            for tree_json in trees:
+                _add_xgboost_tree(builder, tree_json)
+            return builder.build(split_rule="lt", aggregate="sum", bias=_xgboost_base_score(booster))
+
+        if name=="CatBoostRegressor":
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                json_path=os.path.join(tmp_dir, "model.json")
+                model.save_model(json_path, format="json")
+                with open(json_path) as file_obj:
+                    dump=json.load(file_obj)
+            if dump["features_info"].get("categorical_features"):
+                return None
+            flat_feature_index={
+                f["feature_index"]: f["flat_feature_index"] for f in dump["features_info"]["float_features"]
+            }
+            builder=_TreeBuilder()
+            for tree in dump["oblivious_trees"]:
+                _add_catboost_tree(builder, tree, flat_feature_index)
+            scale, bias=dump.get("scale_and_bias", [1.0, [0.0]])
+            return builder.build(aggregate="sum", scale=scale, bias=float(np.ravel(bias)[0]))
+
+        return None
+
+    except Exception as e:
+        raise CustomException(e, sys)
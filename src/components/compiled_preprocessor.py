@@ -0,0 +1,133 @@
+import sys
+
+import numpy as np
+
+from src.exception import CustomException
+
+
+class CompiledPreprocessor:
+    '''
+    Array-only equivalent of the fitted ColumnTransformer built in
+    DataTransformation.get_data_transformer_object. Numeric columns are imputed
+    and standardised with the fitted statistics; every categorical value maps
+    straight to its precomputed scaled one-hot block. Needs neither pandas nor
+    sklearn at transform time and reproduces the sklearn output exactly.
+    '''
+    def __init__(self, numerical_columns, num_fill, num_mean, num_scale,
+                 categorical_columns, cat_fill, categories, cat_tables):
+        self.numerical_columns=list(numerical_columns)
+        self.num_fill=np.asarray(num_fill, dtype=np.float64)
+        self.num_mean=np.asarray(num_mean, dtype=np.float64)
+        self.num_scale=np.asarray(num_scale, dtype=np.float64)
+
+        self.categorical_columns=list(categorical_columns)
+        self.cat_fill=list(cat_fill)
+        self.categories=[np.asarray(c, dtype=object) for c in categories]
+        self.cat_tables=[np.asarray(t, dtype=np.float64) for t in cat_tables]
+        self.category_index=[
+            {value: i for i, value in enumerate(c)} for c in self.categories
+        ]
+
+        self.input_columns=self.numerical_columns+self.categorical_columns
+        self.n_features_out=len(self.numerical_columns)+sum(t.shape[1] for t in self.cat_tables)
+
+    @classmethod
+    def from_column_transformer(cls, preprocessor):
+        '''
+        Extracts the fitted statistics from the num_pipeline/cat_pipeline(s)
+        ColumnTransformer. Raises if the transformer has any other shape.
+        '''
+        try:
+            transformers=[t for t in preprocessor.transformers_ if t[1]!="drop"]
+            if len(transformers)!=2:
+                raise ValueError(f"Expected a numeric and a categorical pipeline, got {len(transformers)}")
+
+            (_, num_pipeline, numerical_columns), (_, cat_pipeline, categorical_columns)=transformers
+            num_imputer, num_scaler=num_pipeline.named_steps["imputer"], num_pipeline.named_steps["scaler"]
+            cat_imputer=cat_pipeline.named_steps["imputer"]
+            encoder=cat_pipeline.named_steps["one_hot_encoder"]
+            cat_scaler=cat_pipeline.named_steps["scaler"]
+
+            if num_scaler.with_mean is False or cat_scaler.with_mean is not False:
+                raise ValueError("Unsupported scaler configuration")
+
+            num_mean=num_scaler.mean_ if num_scaler.mean_ is not None else np.zeros(len(numerical_columns))
+            num_scale=num_scaler.scale_ if num_scaler.scale_ is not None else np.ones(len(numerical_columns))
+
+            ## Row k of each table is exactly what OneHotEncoder -> StandardScaler(with_mean=False)
+            ## produces for category k: 1/scale at its own position, 0 elsewhere
+            cat_scale=cat_scaler.scale_ if cat_scaler.scale_ is not None else np.ones(sum(len(c) for c in encoder.categories_))
+            cat_tables=[]
+            offset=0
+            for column_categories in encoder.categories_:
+                width=len(column_categories)
+                table=np.eye(width, dtype=np.float64)
+                table/=cat_scale[offset:offset+width]
+                cat_tables.append(table)
+                offset+=width
+
+            return cls(
+                numerical_columns=numerical_columns,
+                num_fill=num_imputer.statistics_,
+                num_mean=num_mean,
+                num_scale=num_scale,
+                categorical_columns=categorical_columns,
+                cat_fill=cat_imputer.statistics_,
+                categories=encoder.categories_,
+                cat_tables=cat_tables,
+            )
+
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def _encode(self, j, values):
+        index=self.category_index[j]
+        codes=np.empty(len(values), dtype=np.intp)
+        for i, value in enumerate(values):
+            if value is None or (isinstance(value, float) and value!=value):
+                value=self.cat_fill[j]
+            code=index.get(value)
+            if code is None:
+                raise ValueError(
+                    f"Found unknown category {value!r} in column {self.categorical_columns[j]!r}"
+                )
+            codes[i]=code
+        return codes
+
+    def transform(self, X):
+        '''
+        X is either a mapping of column name -> 1-D array-like or a 2-D array
+        whose columns follow self.input_columns. Returns a float64 matrix.
+        '''
+        try:
+            if hasattr(X, "keys"):
+                columns=[X[name] for name in self.input_columns]
+            else:
+                X=np.asarray(X, dtype=object)
+                if X.ndim==1:
+                    X=X.reshape(1, -1)
+                columns=[X[:, i] for i in range(X.shape[1])]
+
+            n_num=len(self.numerical_columns)
+            numeric=np.column_stack([np.asarray(c, dtype=np.float64) for c in columns[:n_num]])
+            missing=np.isnan(numeric)
+            if missing.any():
+                numeric=np.where(missing, self.num_fill, numeric)
+            numeric-=self.num_mean
+            numeric/=self.num_scale
+
+            blocks=[numeric]
+            for j, values in enumerate(columns[n_num:]):
+                values=np.asarray(values, dtype=object).ravel()
+                blocks.append(self.cat_tables[j][self._encode(j, values)])
+
+            return np.hstack(blocks)
+
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def transform_row(self, row):
+        '''
+        Transforms a single row given as a dict of column name -> scalar.
+        '''
+        return self.transform({name: [row[name]] for name in self.input_columns})
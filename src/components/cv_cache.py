@@ -0,0 +1,116 @@
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+
+import numpy as np
+
+from src.exception import CustomException
+
+## Parameters that change how fast a model trains but not what it learns
+IGNORED_PARAMS={"n_jobs", "thread_count", "verbose", "silent", "logging_level", "train_dir"}
+
+
+def dataset_fingerprint(X, y):
+    '''
+    sha256 over the training matrix (dense or sparse) and target.
+    '''
+    digest=hashlib.sha256()
+    if hasattr(X, "tocsr"):
+        X=X.tocsr()
+        for part in (X.data, X.indices, X.indptr):
+            digest.update(np.ascontiguousarray(part).tobytes())
+    else:
+        X=np.ascontiguousarray(X)
+        digest.update(X.tobytes())
+    digest.update(str((X.shape, str(X.dtype))).encode())
+    digest.update(np.ascontiguousarray(y).tobytes())
+    return digest.hexdigest()
+
+
+def estimator_name(estimator):
+    return f"{type(estimator).__module__}.{type(estimator).__qualname__}"
+
+
+def cv_result_key(estimator, data_fingerprint, cv):
+    '''
+    Key for one CV evaluation: estimator class, its full parameter set
+    including nested estimators' (minus threading/logging knobs at any depth),
+    the dataset fingerprint and the CV splitter. A nested estimator object
+    contributes its class only, its parameters are already listed under
+    <name>__<param>; its repr is truncated by sklearn and would hide them.
+    '''
+    params={}
+    for name, value in estimator.get_params(deep=True).items():
+        if name.rsplit("__", 1)[-1] in IGNORED_PARAMS:
+            continue
+        params[name]=estimator_name(value) if hasattr(value, "get_params") and not isinstance(value, type) else repr(value)
+    payload=json.dumps({
+        "estimator": estimator_name(estimator),
+        "params": params,
+        "data": data_fingerprint,
+        "cv": repr(cv),
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class CVResultStore:
+    '''
+    Persistent SQLite store of cross-validation scores shared across training
+    runs and across the worker processes of one run.
+    '''
+    def __init__(self, db_path):
+        self.db_path=db_path
+        try:
+            os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+            conn=self._connect()
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS cv_results (
+                    key TEXT PRIMARY KEY,
+                    estimator TEXT NOT NULL,
+                    params TEXT NOT NULL,
+                    fold_scores TEXT NOT NULL,
+                    mean_score REAL NOT NULL,
+                    fit_time REAL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            conn.commit()
+            conn.close()
+
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def get(self, key):
+        '''
+        Returns the cached fold scores for key, or None.
+        '''
+        conn=self._connect()
+        try:
+            row=conn.execute('SELECT fold_scores FROM cv_results WHERE key = ?', (key,)).fetchone()
+        finally:
+            conn.close()
+        return None if row is None else json.loads(row[0])
+
+    def put(self, key, estimator, params, fold_scores, fit_time=None):
+        fold_scores=[float(score) for score in fold_scores]
+        conn=self._connect()
+        try:
+            conn.execute('''
+                INSERT OR REPLACE INTO cv_results (key, estimator, params, fold_scores, mean_score, fit_time)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (
+                key,
+                type(estimator).__name__,
+                json.dumps(params, default=repr, sort_keys=True),
+                json.dumps(fold_scores),
+                float(np.mean(fold_scores)),
+                fit_time,
+            ))
+            conn.commit()
+        finally:
+            conn.close()
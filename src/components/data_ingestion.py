@@ -17,15 +17,87 @@ class DataIngestionConfig:
     train_data_path: str=os.path.join('artifacts',"train.csv")
     test_data_path: str=os.path.join('artifacts',"test.csv")
     raw_data_path: str=os.path.join('artifacts',"data.csv")
+    source_data_path: str=os.path.join('notebook','data','stud.csv')
+    ## "memory" reads the whole source and uses train_test_split; "streaming" reads it in
+    ## chunks and splits each row by a stable hash, so memory stays flat for any input size
+    ingestion_mode: str="memory"
+    chunk_size: int=100000
+    test_size: float=0.2
+    ## Columns hashed for the streaming split, None hashes the whole row
+    split_key_columns: tuple=None
+    save_raw_data: bool=True
+
+## Resolution of the hashed split, test_size is rounded to a multiple of 1/SPLIT_BUCKETS
+SPLIT_BUCKETS=10000
 
 class DataIngestion:
     def __init__(self):
         self.ingestion_config=DataIngestionConfig()
 
+    def is_test_row(self,chunk):
+        '''
+        Boolean mask of the rows that belong to the test split. Depends only on
+        the row's key columns, so a row lands in the same split on every run
+        and in every chunking. The chunk must hold the raw field text (read
+        with dtype=str): hash_pandas_object hashes by dtype, and inferred
+        dtypes change per chunk (an int column with a blank reads as float).
+        '''
+        key_columns=list(self.ingestion_config.split_key_columns or chunk.columns)
+        hashes=pd.util.hash_pandas_object(chunk[key_columns],index=False).to_numpy()
+        return (hashes%SPLIT_BUCKETS)<round(self.ingestion_config.test_size*SPLIT_BUCKETS)
+
+    def initiate_streaming_ingestion(self):
+        logging.info("Entered the streaming data ingestion method")
+        try:
+            config=self.ingestion_config
+            os.makedirs(os.path.dirname(config.train_data_path),exist_ok=True)
+
+            outputs={"train":config.train_data_path,"test":config.test_data_path}
+            if config.save_raw_data:
+                outputs["raw"]=config.raw_data_path
+            tmp_paths={name:path+".tmp" for name,path in outputs.items()}
+            rows={name:0 for name in outputs}
+
+            ## Fields stay as their source text, which keeps the hash and the written rows
+            ## independent of the dtypes pandas would infer for each chunk
+            chunks=pd.read_csv(config.source_data_path,chunksize=config.chunk_size,dtype=str,keep_default_na=False)
+            for i,chunk in enumerate(chunks):
+                test_mask=self.is_test_row(chunk)
+                parts={"train":chunk[~test_mask],"test":chunk[test_mask]}
+                if config.save_raw_data:
+                    parts["raw"]=chunk
+
+                for name,part in parts.items():
+                    part.to_csv(tmp_paths[name],mode="w" if i==0 else "a",index=False,header=i==0)
+                    rows[name]+=len(part)
+
+            if rows["train"]+rows["test"]==0:
+                for tmp_path in tmp_paths.values():
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+                raise ValueError(f"{config.source_data_path} has no data rows")
+
+            ## Swap the finished files in together so readers never see a partial split
+            for name,path in outputs.items():
+                os.replace(tmp_paths[name],path)
+
+            logging.info(f"Streaming ingestion completed: {rows['train']} train rows, {rows['test']} test rows")
+
+            return(
+                config.train_data_path,
+                config.test_data_path
+
+            )
+        except Exception as e:
+            raise CustomException(e,sys)
+
     def initiate_data_ingestion(self):
+        if self.ingestion_config.ingestion_mode=="streaming":
+            return self.initiate_streaming_ingestion()
+
         logging.info("Entered the data ingestion method or component")
         try:
-            df=pd.read_csv('notebook\data\stud.csv')
+            df=pd.read_csv(self.ingestion_config.source_data_path)
             logging.info('Read the dataset as dataframe')
 
             os.makedirs(os.path.dirname(self.ingestion_config.train_data_path),exist_ok=True)
@@ -33,7 +105,7 @@ class DataIngestion:
             df.to_csv(self.ingestion_config.raw_data_path,index=False,header=True)
 
             logging.info("Train test split initiated")
-            train_set,test_set=train_test_split(df,test_size=0.2,random_state=42)
+            train_set,test_set=train_test_split(df,test_size=self.ingestion_config.test_size,random_state=42)
 
             train_set.to_csv(self.ingestion_config.train_data_path,index=False,header=True)
 
@@ -54,10 +126,10 @@ if __name__=="__main__":
     train_data,test_data=obj.initiate_data_ingestion()
 
     data_transformation=DataTransformation()
-    train_arr,test_arr,_=data_transformation.initiate_data_transformation(train_data,test_data)
+    X_train,y_train,X_test,y_test,_=data_transformation.initiate_data_transformation(train_data,test_data)
 
     modeltrainer=ModelTrainer()
-    print(modeltrainer.initiate_model_trainer(train_arr,test_arr))
+    print(modeltrainer.initiate_model_trainer(X_train,y_train,X_test,y_test))
 
 
 
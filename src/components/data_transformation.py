@@ -3,6 +3,7 @@ from dataclasses import dataclass
 
 import numpy as np 
 import pandas as pd
+from scipy import sparse
 from sklearn.compose import ColumnTransformer
 from sklearn.impute import SimpleImputer
 from sklearn.pipeline import Pipeline
@@ -10,13 +11,212 @@ from sklearn.preprocessing import OneHotEncoder,StandardScaler
 
 from src.exception import CustomException
 from src.logger import logging
+import hashlib
 import os
+import pickle
+import shutil
+from collections import Counter
+import sklearn
+from sklearn.base import clone
 
-from src.utils import save_object
+from src.utils import save_object,file_fingerprint
+from src.components.compiled_preprocessor import CompiledPreprocessor
 
 @dataclass
 class DataTransformationConfig:
-    preprocessor_obj_file_path=os.path.join('artifacts',"proprocessor.pkl")
+    preprocessor_obj_file_path=os.path.join('artifacts',"preprocessor.pkl")
+    compiled_preprocessor_file_path=os.path.join('artifacts',"compiled_preprocessor.pkl")
+    ## Fitted preprocessors and transformed arrays keyed on input content + transformer definition
+    cache_dir=os.path.join('artifacts',"transformation_cache")
+    use_cache: bool=True
+    ## Disk-backed X/y arrays written by the chunked mode
+    transformed_data_dir=os.path.join('artifacts',"transformed")
+    ## "memory" fits on the full DataFrame, "chunked" streams the CSVs chunk_size rows at a time
+    fit_mode: str="memory"
+    chunk_size: int=100000
+    ## Distinct values counted exactly per numeric column in chunked mode; beyond it the
+    ## counts are merged by rounding, which bounds memory and approximates the median
+    max_distinct_values: int=100000
+
+## Bump to invalidate every cached transformation when the array layout changes
+TRANSFORMATION_CACHE_VERSION=3
+
+FIT_MODES=("memory","chunked")
+
+TRANSFORMED_ARRAYS=("X_train","y_train","X_test","y_test")
+
+## A CSR matrix <name> is stored as <name>.<part>.npy per part plus <name>.shape.npy
+CSR_PARTS=("data","indices","indptr")
+
+INT32_MAX=np.iinfo(np.int32).max
+
+class NpyWriter:
+    '''
+    Streams an array into a .npy file block by block along its first axis
+    without knowing its final length. numpy pads .npy headers so the first
+    dimension can grow in place, so the header is simply rewritten with the
+    real shape on close.
+    '''
+    def __init__(self,path,dtype,trailing_shape=()):
+        self.dtype=np.dtype(dtype)
+        self.trailing_shape=tuple(trailing_shape)
+        self.length=0
+        self.file_obj=open(path,"wb")
+        self.write_header()
+        self.data_offset=self.file_obj.tell()
+
+    def write_header(self):
+        self.file_obj.seek(0)
+        np.lib.format.write_array_header_1_0(self.file_obj,{
+            "descr":np.lib.format.dtype_to_descr(self.dtype),
+            "fortran_order":False,
+            "shape":(self.length,*self.trailing_shape),
+        })
+
+    def append(self,block):
+        block=np.ascontiguousarray(block,dtype=self.dtype)
+        block.tofile(self.file_obj)
+        self.length+=len(block)
+
+    def close(self):
+        self.write_header()
+        if self.file_obj.tell()!=self.data_offset:
+            raise ValueError(f"Header of {self.file_obj.name} changed size")
+        self.file_obj.close()
+
+def rewrite_npy(path,dtype,block_rows=1<<22):
+    ## Converts a .npy file to dtype in bounded memory
+    source=np.load(path,mmap_mode="r")
+    writer=NpyWriter(path+".tmp",dtype,source.shape[1:])
+    for start in range(0,len(source),block_rows):
+        writer.append(source[start:start+block_rows])
+    writer.close()
+    del source
+    os.replace(path+".tmp",path)
+
+def csr_part_path(directory,name,part):
+    return os.path.join(directory,f"{name}.{part}.npy")
+
+class CSRWriter:
+    '''
+    Streams CSR row blocks into the on-disk CSR layout, holding one block in
+    memory at a time. Indices are written as int64 and narrowed to int32 on
+    close when the matrix allows it, since scipy would otherwise copy them
+    into memory when the matrix is rebuilt over the maps.
+    '''
+    def __init__(self,directory,name,n_cols):
+        self.directory=directory
+        self.name=name
+        self.n_cols=n_cols
+        self.n_rows=0
+        self.nnz=0
+        self.writers={
+            part:NpyWriter(csr_part_path(directory,name,part),np.float64 if part=="data" else np.int64)
+            for part in CSR_PARTS
+        }
+        self.writers["indptr"].append([0])
+
+    def append(self,block):
+        block=block.tocsr()
+        self.writers["data"].append(block.data)
+        self.writers["indices"].append(block.indices)
+        self.writers["indptr"].append(block.indptr[1:].astype(np.int64)+self.nnz)
+        self.nnz+=block.nnz
+        self.n_rows+=block.shape[0]
+
+    def close(self):
+        for writer in self.writers.values():
+            writer.close()
+        if max(self.nnz,self.n_cols)<=INT32_MAX:
+            for part in ("indices","indptr"):
+                rewrite_npy(csr_part_path(self.directory,self.name,part),np.int32)
+        np.save(csr_part_path(self.directory,self.name,"shape"),np.array([self.n_rows,self.n_cols],dtype=np.int64))
+
+def save_transformed_arrays(directory,arrays):
+    '''
+    Writes X_train, y_train, X_test, y_test into directory as .npy files,
+    sparse feature matrices as one file per CSR part.
+    '''
+    os.makedirs(directory,exist_ok=True)
+    for name,array in zip(TRANSFORMED_ARRAYS,arrays):
+        if sparse.issparse(array):
+            array=array.tocsr()
+            for part in CSR_PARTS:
+                np.save(csr_part_path(directory,name,part),getattr(array,part))
+            np.save(csr_part_path(directory,name,"shape"),np.array(array.shape,dtype=np.int64))
+            continue
+        np.save(os.path.join(directory,name+".npy"),array)
+
+def load_transformed_arrays(directory):
+    '''
+    Loads what save_transformed_arrays or the chunked mode wrote. Every array
+    is memory-mapped, sparse matrices are rebuilt over their mapped parts
+    without copying them. The parts are mapped copy-on-write because
+    CatBoost rejects read-only sparse buffers; the files are never modified.
+    '''
+    arrays=[]
+    for name in TRANSFORMED_ARRAYS:
+        shape_path=csr_part_path(directory,name,"shape")
+        if os.path.exists(shape_path):
+            parts=tuple(np.load(csr_part_path(directory,name,part),mmap_mode="c") for part in CSR_PARTS)
+            shape=tuple(int(n) for n in np.load(shape_path))
+            arrays.append(sparse.csr_matrix(parts,shape=shape,copy=False))
+        else:
+            arrays.append(np.load(os.path.join(directory,name+".npy"),mmap_mode="r"))
+    return tuple(arrays)
+
+def round_significant(values,digits):
+    values=np.asarray(values,dtype=np.float64)
+    magnitude=np.floor(np.log10(np.abs(values),out=np.zeros_like(values),where=values!=0))
+    scale=10.0**(digits-1-magnitude)
+    return np.round(values*scale)/scale
+
+class BoundedValueCounts:
+    '''
+    {value: count} of a numeric column in bounded memory. Counts are exact
+    until more than max_distinct distinct values have been seen; after that
+    every value is rounded to `digits` significant digits, starting at 12
+    and dropping one digit whenever the limit is reached again. A median
+    taken from the counts is then within a relative error of about
+    10**(1-digits) of the exact one.
+    '''
+    def __init__(self,max_distinct):
+        self.max_distinct=max_distinct
+        self.digits=None
+        self.counts=Counter()
+
+    def update(self,values):
+        values=np.asarray(values,dtype=np.float64)
+        if self.digits is not None:
+            values=round_significant(values,self.digits)
+        self.counts.update(pd.Series(values).value_counts().to_dict())
+        while len(self.counts)>self.max_distinct and (self.digits is None or self.digits>1):
+            self.digits=12 if self.digits is None else self.digits-1
+            merged=Counter()
+            for value,count in zip(round_significant(list(self.counts),self.digits),self.counts.values()):
+                merged[float(value)]+=count
+            self.counts=merged
+
+    @property
+    def exact(self):
+        return self.digits is None
+
+def median_from_counts(counts):
+    '''
+    Median of the values described by a {value: count} mapping, the mean of
+    the two middle values for an even count (as np.median).
+    '''
+    values=sorted(counts)
+    cumulative=np.cumsum([counts[value] for value in values])
+    total=cumulative[-1]
+    lower=values[np.searchsorted(cumulative,(total-1)//2,side="right")]
+    upper=values[np.searchsorted(cumulative,total//2,side="right")]
+    return (lower+upper)/2
+
+def mode_from_counts(counts):
+    ## Ties go to the smallest value, as in SimpleImputer(strategy="most_frequent")
+    top=max(counts.values())
+    return min(value for value,count in counts.items() if count==top)
 
 class DataTransformation:
     def __init__(self):
@@ -58,12 +258,14 @@ class DataTransformation:
             logging.info(f"Categorical columns: {categorical_columns}")
             logging.info(f"Numerical columns: {numerical_columns}")
 
+            ## sparse_threshold=1 keeps the output CSR whenever the one-hot block is sparse
             preprocessor=ColumnTransformer(
                 [
                 ("num_pipeline",num_pipeline,numerical_columns),
                 ("cat_pipelines",cat_pipeline,categorical_columns)
 
-                ]
+                ],
+                sparse_threshold=1.0
 
 
             )
@@ -73,9 +275,220 @@ class DataTransformation:
         except Exception as e:
             raise CustomException(e,sys)
         
+    def get_cache_key(self,train_path,test_path):
+        '''
+        Hash of the train/test file contents, the unfitted transformer
+        definition and the sklearn version.
+        '''
+        digest=hashlib.sha256()
+        digest.update(str(TRANSFORMATION_CACHE_VERSION).encode())
+        digest.update(sklearn.__version__.encode())
+        digest.update(file_fingerprint(train_path).encode())
+        digest.update(file_fingerprint(test_path).encode())
+        digest.update(pickle.dumps(self.get_data_transformer_object()))
+        return digest.hexdigest()
+
+    def load_cached_transformation(self,cache_key):
+        '''
+        On a cache hit, restores the cached preprocessors to their configured
+        paths and returns the memory-mapped arrays; returns None on a miss.
+        '''
+        config=self.data_transformation_config
+        entry_dir=os.path.join(config.cache_dir,cache_key)
+        if not os.path.isdir(entry_dir):
+            return None
+
+        logging.info(f"Transformation cache hit {cache_key}")
+
+        for file_name,target_path in (
+            ("preprocessor.pkl",config.preprocessor_obj_file_path),
+            ("compiled_preprocessor.pkl",config.compiled_preprocessor_file_path),
+        ):
+            os.makedirs(os.path.dirname(target_path),exist_ok=True)
+            shutil.copyfile(os.path.join(entry_dir,file_name),target_path)
+
+        return (
+            *load_transformed_arrays(entry_dir),
+            config.preprocessor_obj_file_path,
+        )
+
+    def save_cached_transformation(self,cache_key,arrays):
+        config=self.data_transformation_config
+        entry_dir=os.path.join(config.cache_dir,cache_key)
+        tmp_dir=entry_dir+".tmp"
+        shutil.rmtree(tmp_dir,ignore_errors=True)
+        os.makedirs(tmp_dir)
+
+        save_transformed_arrays(tmp_dir,arrays)
+        shutil.copyfile(config.preprocessor_obj_file_path,os.path.join(tmp_dir,"preprocessor.pkl"))
+        shutil.copyfile(config.compiled_preprocessor_file_path,os.path.join(tmp_dir,"compiled_preprocessor.pkl"))
+
+        ## The entry only becomes visible once it is complete
+        if os.path.isdir(entry_dir):
+            shutil.rmtree(tmp_dir)
+        else:
+            os.replace(tmp_dir,entry_dir)
+        logging.info(f"Saved transformation cache entry {cache_key}")
+
+    def iter_csv_chunks(self,file_path,**kwargs):
+        return pd.read_csv(file_path,chunksize=self.data_transformation_config.chunk_size,**kwargs)
+
+    def fit_preprocessor_in_chunks(self,train_path,target_column_name):
+        '''
+        Fits the preprocessor without loading the training set: a first pass
+        counts the values of every column (medians, modes and one-hot
+        categories), a second pass feeds each pipeline's imputed/encoded
+        chunks to its scaler's partial_fit. Scaler statistics equal fit() on
+        the full DataFrame up to float rounding.
+
+        Categorical columns are counted exactly, so memory grows with their
+        number of categories (which OneHotEncoder needs anyway). Numeric
+        columns are counted exactly up to max_distinct_values distinct values
+        and with rounded values beyond it (see BoundedValueCounts): memory
+        stays bounded for continuous columns, and the median fill value is
+        then approximate rather than exact.
+
+        Returns the fitted preprocessor and the number of training rows.
+        '''
+        config=self.data_transformation_config
+        preprocessing_obj=self.get_data_transformer_object()
+        numeric_columns=set()
+        counted_columns=[]
+        for _,pipeline,columns in preprocessing_obj.transformers:
+            counted_columns.extend(columns)
+            if pipeline.named_steps["imputer"].strategy=="median":
+                numeric_columns.update(columns)
+
+        value_counts={
+            column:BoundedValueCounts(config.max_distinct_values) if column in numeric_columns else Counter()
+            for column in counted_columns
+        }
+        n_rows=0
+        first_row=None
+        for chunk in self.iter_csv_chunks(train_path):
+            if first_row is None:
+                first_row=chunk.drop(columns=[target_column_name]).iloc[:1]
+            n_rows+=len(chunk)
+            for column,counts in value_counts.items():
+                values=chunk[column].dropna()
+                if column in numeric_columns:
+                    counts.update(values.to_numpy())
+                else:
+                    counts.update(values.value_counts().to_dict())
+
+        approximate=[column for column in numeric_columns if not value_counts[column].exact]
+        if approximate:
+            logging.info(f"More than {config.max_distinct_values} distinct values in {approximate}, their medians are approximate")
+        value_counts={
+            column:counts.counts if column in numeric_columns else counts
+            for column,counts in value_counts.items()
+        }
+        logging.info(f"Counted values of {len(counted_columns)} columns over {n_rows} training rows")
+
+        ## A small frame holding every category fixes the fitted structure
+        ## (column order, categories_, output layout); the statistics are set below
+        n_sample=max([len(value_counts[column]) for column in counted_columns if column not in numeric_columns] or [1])
+        sample_df=first_row.loc[first_row.index.repeat(n_sample)].reset_index(drop=True)
+        for column,counts in value_counts.items():
+            values=sorted(counts)
+            sample_df[column]=[values[i%len(values)] for i in range(n_sample)]
+        preprocessing_obj.fit(sample_df)
+
+        fitted_pipelines=[
+            (pipeline,columns) for name,pipeline,columns in preprocessing_obj.transformers_
+            if name!="remainder"
+        ]
+        for pipeline,columns in fitted_pipelines:
+            imputer=pipeline.named_steps["imputer"]
+            if imputer.strategy=="median":
+                imputer.statistics_=np.array([median_from_counts(value_counts[c]) for c in columns],dtype=np.float64)
+            else:
+                imputer.statistics_=np.array([mode_from_counts(value_counts[c]) for c in columns],dtype=object)
+
+        scalers=[clone(pipeline.steps[-1][1]) for pipeline,_ in fitted_pipelines]
+        for chunk in self.iter_csv_chunks(train_path):
+            for (pipeline,columns),scaler in zip(fitted_pipelines,scalers):
+                scaler.partial_fit(pipeline[:-1].transform(chunk[columns]))
+
+        for (pipeline,_),scaler in zip(fitted_pipelines,scalers):
+            pipeline.steps[-1]=(pipeline.steps[-1][0],scaler)
+
+        return preprocessing_obj,n_rows
+
+    def transform_csv_in_chunks(self,preprocessing_obj,csv_path,target_column_name,directory,name):
+        '''
+        Transforms csv_path chunk by chunk straight into X_<name> and y_<name>
+        under directory: X in the on-disk CSR layout when the preprocessor
+        output is sparse, otherwise as a dense float64 .npy. Only one chunk is
+        in memory at a time.
+        '''
+        y_writer=NpyWriter(os.path.join(directory,f"y_{name}.npy"),np.float64)
+        X_writer=None
+        for chunk in self.iter_csv_chunks(csv_path):
+            features=preprocessing_obj.transform(chunk.drop(columns=[target_column_name]))
+            if X_writer is None:
+                if sparse.issparse(features):
+                    X_writer=CSRWriter(directory,f"X_{name}",features.shape[1])
+                else:
+                    X_writer=NpyWriter(os.path.join(directory,f"X_{name}.npy"),np.float64,features.shape[1:])
+            X_writer.append(features)
+            y_writer.append(chunk[target_column_name].to_numpy(dtype=np.float64))
+
+        if X_writer is None:
+            raise ValueError(f"{csv_path} has no rows")
+        X_writer.close()
+        y_writer.close()
+
+    def initiate_chunked_transformation(self,train_path,test_path,cache_key=None):
+        config=self.data_transformation_config
+        target_column_name="math_score"
+
+        logging.info(f"Fitting preprocessing object in chunks of {config.chunk_size} rows")
+        preprocessing_obj,_=self.fit_preprocessor_in_chunks(train_path,target_column_name)
+
+        tmp_dir=config.transformed_data_dir+".tmp"
+        shutil.rmtree(tmp_dir,ignore_errors=True)
+        os.makedirs(tmp_dir)
+        for name,csv_path in (("train",train_path),("test",test_path)):
+            self.transform_csv_in_chunks(preprocessing_obj,csv_path,target_column_name,tmp_dir,name)
+
+        shutil.rmtree(config.transformed_data_dir,ignore_errors=True)
+        os.replace(tmp_dir,config.transformed_data_dir)
+        arrays=load_transformed_arrays(config.transformed_data_dir)
+        logging.info(f"Wrote transformed arrays to {config.transformed_data_dir}")
+
+        save_object(file_path=config.preprocessor_obj_file_path,obj=preprocessing_obj)
+        save_object(
+            file_path=config.compiled_preprocessor_file_path,
+            obj=CompiledPreprocessor.from_column_transformer(preprocessing_obj),
+            mmap=True
+        )
+
+        if cache_key is not None:
+            self.save_cached_transformation(cache_key,arrays)
+
+        return (
+            *arrays,
+            config.preprocessor_obj_file_path,
+        )
+
     def initiate_data_transformation(self,train_path,test_path):
 
         try:
+            fit_mode=self.data_transformation_config.fit_mode
+            if fit_mode not in FIT_MODES:
+                raise ValueError(f"Unknown fit mode {fit_mode!r}, expected one of {FIT_MODES}")
+
+            cache_key=None
+            if self.data_transformation_config.use_cache:
+                cache_key=self.get_cache_key(train_path,test_path)
+                cached=self.load_cached_transformation(cache_key)
+                if cached is not None:
+                    return cached
+
+            if fit_mode=="chunked":
+                return self.initiate_chunked_transformation(train_path,test_path,cache_key)
+
             train_df=pd.read_csv(train_path)
             test_df=pd.read_csv(test_path)
 
@@ -98,13 +511,11 @@ class DataTransformation:
                 f"Applying preprocessing object on training dataframe and testing dataframe."
             )
 
-            input_feature_train_arr=preprocessing_obj.fit_transform(input_feature_train_df)
-            input_feature_test_arr=preprocessing_obj.transform(input_feature_test_df)
-
-            train_arr = np.c_[
-                input_feature_train_arr, np.array(target_feature_train_df)
-            ]
-            test_arr = np.c_[input_feature_test_arr, np.array(target_feature_test_df)]
+            ## X stays as the preprocessor returns it (CSR) and y is kept apart, no dense np.c_ copy
+            X_train=preprocessing_obj.fit_transform(input_feature_train_df)
+            X_test=preprocessing_obj.transform(input_feature_test_df)
+            y_train=target_feature_train_df.to_numpy(dtype=np.float64)
+            y_test=target_feature_test_df.to_numpy(dtype=np.float64)
 
             logging.info(f"Saved preprocessing object.")
 
@@ -115,9 +526,22 @@ class DataTransformation:
 
             )
 
+            logging.info("Saved compiled preprocessing object for serving")
+
+            save_object(
+                file_path=self.data_transformation_config.compiled_preprocessor_file_path,
+                obj=CompiledPreprocessor.from_column_transformer(preprocessing_obj),
+                mmap=True
+            )
+
+            if cache_key is not None:
+                self.save_cached_transformation(cache_key,(X_train,y_train,X_test,y_test))
+
             return (
-                train_arr,
-                test_arr,
+                X_train,
+                y_train,
+                X_test,
+                y_test,
                 self.data_transformation_config.preprocessor_obj_file_path,
             )
         except Exception as e:
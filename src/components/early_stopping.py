@@ -0,0 +1,73 @@
+import sys
+
+from sklearn.base import BaseEstimator, RegressorMixin, clone
+from sklearn.model_selection import train_test_split
+
+from src.exception import CustomException
+
+## Estimators whose round count is found by early stopping instead of the grid
+ROUND_PARAMS={
+    "GradientBoostingRegressor": "n_estimators",
+    "XGBRegressor": "n_estimators",
+    "CatBoostRegressor": "iterations",
+}
+
+
+class EarlyStoppingRegressor(BaseEstimator, RegressorMixin):
+    '''
+    Fits an XGBoost or CatBoost regressor with early stopping on a validation
+    fold held out from whatever data fit() receives, so inside a CV search
+    every fold stops on its own training split. The estimator's round
+    parameter is only an upper bound. Hyperparameters of the wrapped model are
+    searched as estimator__<name>; the fitted booster is estimator_.
+    '''
+    def __init__(self, estimator=None, validation_fraction=0.1, early_stopping_rounds=10, random_state=None):
+        self.estimator=estimator
+        self.validation_fraction=validation_fraction
+        self.early_stopping_rounds=early_stopping_rounds
+        self.random_state=random_state
+
+    def fit(self, X, y):
+        try:
+            X_fit, X_val, y_fit, y_val=train_test_split(
+                X, y, test_size=self.validation_fraction, random_state=self.random_state
+            )
+            estimator=clone(self.estimator)
+            name=type(estimator).__name__
+
+            if name=="XGBRegressor":
+                estimator.set_params(early_stopping_rounds=self.early_stopping_rounds)
+                estimator.fit(X_fit, y_fit, eval_set=[(X_val, y_val)], verbose=False)
+            elif name=="CatBoostRegressor":
+                estimator.fit(
+                    X_fit, y_fit, eval_set=(X_val, y_val),
+                    early_stopping_rounds=self.early_stopping_rounds, use_best_model=True,
+                )
+            else:
+                raise ValueError(f"Early stopping is not supported for {name}")
+
+            self.estimator_=estimator
+            self.n_rounds_=boosting_rounds(estimator)
+            return self
+
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def predict(self, X):
+        return self.estimator_.predict(X)
+
+
+def boosting_rounds(model):
+    '''
+    Number of boosting rounds a fitted model actually uses, or None for
+    models that are not boosted.
+    '''
+    name=type(model).__name__
+    if name=="GradientBoostingRegressor":
+        return int(model.n_estimators_)
+    if name=="XGBRegressor":
+        best_iteration=model.get_booster().attr("best_iteration")
+        return int(best_iteration)+1 if best_iteration is not None else int(model.get_booster().num_boosted_rounds())
+    if name=="CatBoostRegressor":
+        return int(model.tree_count_)
+    return None
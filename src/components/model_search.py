@@ -0,0 +1,175 @@
+import math
+import sys
+import time
+
+import numpy as np
+from sklearn.base import clone
+from sklearn.model_selection import GridSearchCV, ParameterGrid, check_cv, cross_val_score
+
+from src.components.cv_cache import CVResultStore, cv_result_key, dataset_fingerprint
+from src.exception import CustomException
+from src.logger import logging
+
+SEARCH_MODES = ("grid", "random", "halving")
+
+
+class BudgetedSearchCV:
+    '''
+    Evaluates grid configurations one at a time, in grid order or shuffled
+    (without replacement), until a fit-count or wall-clock budget runs out,
+    then refits the best one on the full training set. At least one
+    configuration is always evaluated.
+
+    With a cv_store (CVResultStore), configurations already scored on the
+    same data and CV split in any earlier run are read back instead of refit;
+    cached configurations do not count against the budget.
+
+    Exposes the GridSearchCV attributes the trainer uses: best_params_,
+    best_score_, best_estimator_, cv_results_, n_splits_ and refit_time_, plus
+    n_fits_ (CV fits actually run) and n_cached_.
+    '''
+    def __init__(self, estimator, param_grid, cv=3, max_fits=None, time_budget=None,
+                 shuffle=True, random_state=None, n_jobs=None, refit=True, cv_store=None):
+        self.estimator=estimator
+        self.param_grid=param_grid
+        self.cv=cv
+        self.max_fits=max_fits
+        self.time_budget=time_budget
+        self.shuffle=shuffle
+        self.random_state=random_state
+        self.n_jobs=n_jobs
+        self.refit=refit
+        self.cv_store=cv_store
+
+    def fit(self, X, y):
+        candidates=list(ParameterGrid(self.param_grid))
+        order=np.arange(len(candidates))
+        if self.shuffle:
+            order=np.random.RandomState(self.random_state).permutation(len(candidates))
+
+        cv=check_cv(self.cv)
+        n_splits=cv.get_n_splits(X, y)
+        data_fingerprint=dataset_fingerprint(X, y) if self.cv_store is not None else None
+
+        start=time.perf_counter()
+        n_fits=0
+        n_cached=0
+        tried=[]
+        scores=[]
+        for index in order:
+            params=candidates[index]
+            estimator=clone(self.estimator).set_params(**params)
+
+            fold_scores=None
+            if self.cv_store is not None:
+                key=cv_result_key(estimator, data_fingerprint, cv)
+                fold_scores=self.cv_store.get(key)
+
+            if fold_scores is not None:
+                n_cached+=1
+            else:
+                if tried and self.max_fits is not None and n_fits+n_splits>self.max_fits:
+                    break
+                if tried and self.time_budget is not None and time.perf_counter()-start>=self.time_budget:
+                    break
+
+                fit_start=time.perf_counter()
+                fold_scores=cross_val_score(estimator, X, y, cv=cv, n_jobs=self.n_jobs)
+                n_fits+=n_splits
+                if self.cv_store is not None:
+                    self.cv_store.put(key, estimator, params, fold_scores, time.perf_counter()-fit_start)
+
+            tried.append(params)
+            scores.append(float(np.mean(fold_scores)))
+
+        best=int(np.argmax(scores))
+        self.best_params_=tried[best]
+        self.best_score_=scores[best]
+        self.best_index_=best
+        self.cv_results_={"params": tried, "mean_test_score": np.asarray(scores)}
+        self.n_candidates_=len(candidates)
+        self.n_fits_=n_fits
+        self.n_cached_=n_cached
+        self.n_splits_=n_splits
+
+        logging.info(
+            f"Search of {type(self.estimator).__name__} scored {len(tried)}/{len(candidates)} configurations "
+            f"({n_cached} from the CV cache) in {time.perf_counter()-start:.1f}s"
+        )
+
+        if self.refit:
+            refit_start=time.perf_counter()
+            self.best_estimator_=clone(self.estimator).set_params(**self.best_params_).fit(X, y)
+            self.refit_time_=time.perf_counter()-refit_start
+        return self
+
+
+def halving_fits(n_candidates, n_splits, factor=3):
+    '''
+    CV fits of a successive-halving search started with n_candidates and
+    min_resources="exhaust": as in sklearn, it runs 1 + floor(log_factor(n))
+    rounds and keeps ceil(n/factor) candidates after each one.
+    '''
+    n_iterations=1+math.floor(math.log(n_candidates, factor))
+    fits=0
+    for _ in range(n_iterations):
+        fits+=n_candidates*n_splits
+        n_candidates=math.ceil(n_candidates/factor)
+    return fits
+
+
+def make_search_cv(model, para, cv=3, n_jobs=None, search_mode="grid", max_fits=None,
+                   time_budget=None, random_state=None, cv_cache_path=None):
+    '''
+    Builds the hyperparameter search for one model:
+
+    grid     every configuration; GridSearchCV, or BudgetedSearchCV in grid
+             order when cv_cache_path is set so earlier CV scores are reused
+    random   BudgetedSearchCV in random order, bounded by max_fits and/or
+             time_budget seconds
+    halving  HalvingRandomSearchCV over the grid, starting with as many
+             candidates as keep its total CV fits within max_fits (at least
+             one) on a small sample and keeping the best third each round;
+             time_budget is not supported (fits on subsamples are not cached)
+    '''
+    try:
+        cv_store=CVResultStore(cv_cache_path) if cv_cache_path else None
+
+        if search_mode=="grid":
+            if cv_store is None:
+                return GridSearchCV(model, para, cv=cv, n_jobs=n_jobs)
+            return BudgetedSearchCV(model, para, cv=cv, shuffle=False, n_jobs=n_jobs, cv_store=cv_store)
+
+        if search_mode=="random":
+            return BudgetedSearchCV(
+                model, para, cv=cv, max_fits=max_fits, time_budget=time_budget,
+                random_state=random_state, n_jobs=n_jobs, cv_store=cv_store,
+            )
+
+        if search_mode=="halving":
+            ## Successive halving is still experimental in sklearn and has to be enabled explicitly
+            from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+            from sklearn.model_selection import HalvingRandomSearchCV
+
+            if time_budget is not None:
+                raise ValueError("time_budget is not supported in halving mode, use max_fits")
+
+            factor=3
+            n_splits=check_cv(cv).get_n_splits()
+            grid_size=len(ParameterGrid(para))
+            n_candidates=grid_size
+            if max_fits is not None:
+                n_candidates=1
+                while n_candidates<grid_size and halving_fits(n_candidates+1, n_splits, factor)<=max_fits:
+                    n_candidates+=1
+            ## "exhaust" sizes the first round so the last one trains on the full sample,
+            ## which also makes every round halving_fits counts actually run
+            return HalvingRandomSearchCV(
+                model, para, n_candidates=n_candidates, factor=factor, cv=cv,
+                min_resources="exhaust", random_state=random_state, n_jobs=n_jobs,
+            )
+
+        raise ValueError(f"Unknown search mode {search_mode!r}, expected one of {SEARCH_MODES}")
+
+    except Exception as e:
+        raise CustomException(e, sys)
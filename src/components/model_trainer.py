@@ -1,3 +1,4 @@
+import json
 import os
 import sys
 from dataclasses import dataclass
@@ -17,26 +18,134 @@ from xgboost import XGBRegressor
 from src.exception import CustomException
 from src.logger import logging
 
-from src.utils import save_object,evaluate_models
+import numpy as np
+
+from src.utils import save_object,evaluate_models,load_object,file_fingerprint,as_model_input
+from src.components.compact_model import export_compact_model
+from src.components.early_stopping import EarlyStoppingRegressor,ROUND_PARAMS
+from src.components.data_transformation import DataTransformationConfig
+from src.components.prediction_table import PredictionTableBuilder
 
 @dataclass
 class ModelTrainerConfig:
     trained_model_file_path=os.path.join("artifacts","model.pkl")
+    compact_model_file_path=os.path.join("artifacts","compact_model.pkl")
+    training_report_file_path=os.path.join("artifacts","training_report.json")
+    ## Cross-run store of CV scores, so reruns only fit configurations not scored before
+    cv_cache_file_path=os.path.join("artifacts","cv_cache.db")
+    use_cv_cache: bool=True
+    ## Score the whole finite input domain into artifacts/prediction_table.npy after training
+    build_prediction_table: bool=False
+    ## Total cores for model search, shared between models searched in parallel and their own threads
+    n_jobs: int=os.cpu_count() or 1
+    ## "grid" searches every configuration; "random" and "halving" stop at the per-model budget below
+    search_mode: str="grid"
+    ## CV fit budget per model ("random", "halving") and wall-clock budget in seconds per model ("random" only)
+    search_max_fits: int=30
+    search_time_budget: float=None
+    search_random_state: int=42
+    ## Boosting models stop on a held-out validation fold instead of grid-searching their round count
+    early_stopping: bool=False
+    early_stopping_rounds: int=10
+    early_stopping_max_rounds: int=1000
+    validation_fraction: float=0.1
 
 class ModelTrainer:
     def __init__(self):
         self.model_trainer_config=ModelTrainerConfig()
 
 
-    def initiate_model_trainer(self,train_array,test_array):
+    def search_options(self):
+        config=self.model_trainer_config
+        ## Checked here too so the run fails before any model is fitted in the pool
+        if config.search_mode=="halving" and config.search_time_budget is not None:
+            raise ValueError("search_time_budget is not supported in halving mode, use search_max_fits")
+        return {
+            "search_mode": config.search_mode,
+            "max_fits": config.search_max_fits,
+            "time_budget": config.search_time_budget,
+            "random_state": config.search_random_state,
+            "cv_cache_path": config.cv_cache_file_path if config.use_cv_cache else None,
+        }
+
+    def apply_early_stopping(self, models, params):
+        '''
+        Drops the round count (n_estimators/iterations) from the grid of every
+        boosting model and lets it stop early instead, with
+        early_stopping_max_rounds as the upper bound. GradientBoosting uses its
+        own n_iter_no_change; XGBoost and CatBoost are wrapped in
+        EarlyStoppingRegressor, so their grid keys move under estimator__.
+        '''
+        config=self.model_trainer_config
+        for name,model in models.items():
+            round_param=ROUND_PARAMS.get(type(model).__name__)
+            if round_param is None:
+                continue
+
+            grid={key:values for key,values in params[name].items() if key!=round_param}
+            model.set_params(**{round_param: config.early_stopping_max_rounds})
+            if isinstance(model, GradientBoostingRegressor):
+                model.set_params(
+                    n_iter_no_change=config.early_stopping_rounds,
+                    validation_fraction=config.validation_fraction,
+                    random_state=config.search_random_state,
+                )
+            else:
+                model=EarlyStoppingRegressor(
+                    model,
+                    validation_fraction=config.validation_fraction,
+                    early_stopping_rounds=config.early_stopping_rounds,
+                    random_state=config.search_random_state,
+                )
+                grid={f"estimator__{key}":values for key,values in grid.items()}
+
+            models[name]=model
+            params[name]=grid
+            logging.info(f"{name}: early stopping replaces the {round_param} grid")
+        return models,params
+
+    def save_training_report(self, training_report):
+        '''
+        Writes the per-model search/refit/predict timings, fit counts and peak
+        RSS growth collected by evaluate_models as JSON.
+        '''
+        report_path=self.model_trainer_config.training_report_file_path
+        os.makedirs(os.path.dirname(report_path), exist_ok=True)
+        with open(report_path, "w") as file_obj:
+            json.dump(training_report, file_obj, indent=2, default=str)
+        logging.info(f"Saved training report to {report_path}")
+
+    def export_compact_model(self, best_model, X_test):
+        '''
+        Saves the sklearn-free array form of the best model for serving, if it
+        has one and it reproduces the estimator's predictions on the test set.
+        '''
+        X_test=as_model_input(best_model, X_test)
+        compact_model=export_compact_model(best_model)
+        if compact_model is None:
+            logging.info(f"No compact form for {type(best_model).__name__}, serving will use model.pkl")
+            return None
+
+        if not np.allclose(compact_model.predict(X_test), best_model.predict(X_test), rtol=1e-5, atol=1e-4):
+            logging.info("Compact model does not reproduce the estimator, not exporting it")
+            return None
+
+        compact_model.source_fingerprint=file_fingerprint(self.model_trainer_config.trained_model_file_path)
+        compact_model.preprocessor_fingerprint=file_fingerprint(DataTransformationConfig().preprocessor_obj_file_path)
+        save_object(
+            file_path=self.model_trainer_config.compact_model_file_path,
+            obj=compact_model,
+            mmap=True
+        )
+        logging.info("Saved compact model for serving")
+        return self.model_trainer_config.compact_model_file_path
+
+    def initiate_model_trainer(self,X_train,y_train,X_test,y_test):
+        '''
+        X_train/X_test may be sparse (CSR); each estimator gets them in the
+        form it handles, see src.utils.as_model_input.
+        '''
         try:
-            logging.info("Split training and test input data")
-            X_train,y_train,X_test,y_test=(
-                train_array[:,:-1],
-                train_array[:,-1],
-                test_array[:,:-1],
-                test_array[:,-1]
-            )
             models = {
                 "Random Forest": RandomForestRegressor(),
                 "Decision Tree": DecisionTreeRegressor(),
@@ -84,8 +193,17 @@ class ModelTrainer:
                 
             }
 
+            if self.model_trainer_config.early_stopping:
+                models,params=self.apply_early_stopping(models,params)
+
+            training_report={}
             model_report:dict=evaluate_models(X_train=X_train,y_train=y_train,X_test=X_test,y_test=y_test,
-                                             models=models,param=params)
+                                             models=models,param=params,
+                                             n_jobs=self.model_trainer_config.n_jobs,
+                                             search_options=self.search_options(),
+                                             training_report=training_report)
+
+            self.save_training_report(training_report)
             
             ## To get best model score from dict
             best_model_score = max(sorted(model_report.values()))
@@ -106,7 +224,19 @@ class ModelTrainer:
                 obj=best_model
             )
 
-            predicted=best_model.predict(X_test)
+            self.export_compact_model(best_model, X_test)
+
+            if self.model_trainer_config.build_prediction_table:
+                compiled_preprocessor=load_object(
+                    file_path=DataTransformationConfig().compiled_preprocessor_file_path
+                )
+                PredictionTableBuilder().initiate_table_build(
+                    best_model, compiled_preprocessor,
+                    source_fingerprint=file_fingerprint(self.model_trainer_config.trained_model_file_path),
+                    preprocessor_fingerprint=file_fingerprint(DataTransformationConfig().preprocessor_obj_file_path),
+                )
+
+            predicted=best_model.predict(as_model_input(best_model, X_test))
 
             r2_square = r2_score(y_test, predicted)
             return r2_square
@@ -0,0 +1,153 @@
+import itertools
+import os
+import sys
+from dataclasses import dataclass
+
+import numpy as np
+
+from src.exception import CustomException
+from src.logger import logging
+from src.utils import save_object
+
+
+@dataclass
+class PredictionTableConfig:
+    table_file_path: str=os.path.join("artifacts", "prediction_table.npy")
+    table_meta_file_path: str=os.path.join("artifacts", "prediction_table.pkl")
+    score_columns: tuple=("reading_score", "writing_score")
+    score_min: int=0
+    score_max: int=100
+    ## Category combinations scored per model.predict call
+    combos_per_batch: int=8
+
+
+class PredictionTable:
+    '''
+    Dense float32 table of predictions for every (category combination,
+    integer reading score, integer writing score). The values are a read-only
+    memory map, so every worker on a box shares one page-cache copy.
+    '''
+    ## file_fingerprint of the model.pkl and preprocessor.pkl the table was scored with
+    source_fingerprint=None
+    preprocessor_fingerprint=None
+
+    def __init__(self, table_file_path, categorical_columns, categories, score_columns, score_min, score_max):
+        self.table_file_path=table_file_path
+        self.categorical_columns=list(categorical_columns)
+        self.categories=[list(c) for c in categories]
+        self.score_columns=list(score_columns)
+        self.score_min=score_min
+        self.score_max=score_max
+        self._values=None
+        self._build_index()
+
+    def _build_index(self):
+        self.category_index=[{value: i for i, value in enumerate(c)} for c in self.categories]
+        self.n_scores=self.score_max-self.score_min+1
+        ## Row-major strides over (cat_0, ..., cat_k, score_0, score_1)
+        shape=[len(c) for c in self.categories]+[self.n_scores]*len(self.score_columns)
+        self.shape=tuple(shape)
+        self.strides=tuple(int(np.prod(shape[i+1:])) for i in range(len(shape)))
+
+    def __getstate__(self):
+        state=self.__dict__.copy()
+        state["_values"]=None
+        return state
+
+    @property
+    def values(self):
+        if self._values is None:
+            self._values=np.load(self.table_file_path, mmap_mode="r")
+        return self._values
+
+    def index_of(self, row):
+        '''
+        Returns the flat table index for a row dict, or None when the row is
+        outside the precomputed domain (unknown category, non-integer score).
+        '''
+        flat=0
+        for j, name in enumerate(self.categorical_columns):
+            code=self.category_index[j].get(row.get(name))
+            if code is None:
+                return None
+            flat+=code*self.strides[j]
+
+        offset=len(self.categorical_columns)
+        for k, name in enumerate(self.score_columns):
+            try:
+                score=float(row.get(name))
+            except (TypeError, ValueError):
+                return None
+            if not score.is_integer() or not self.score_min<=score<=self.score_max:
+                return None
+            flat+=(int(score)-self.score_min)*self.strides[offset+k]
+        return flat
+
+    def lookup(self, row):
+        index=self.index_of(row)
+        if index is None:
+            return None
+        return float(self.values[index])
+
+
+class PredictionTableBuilder:
+    def __init__(self):
+        self.table_config=PredictionTableConfig()
+
+    def initiate_table_build(self, model, compiled_preprocessor, source_fingerprint=None, preprocessor_fingerprint=None):
+        '''
+        Scores the full input grid in vectorized batches and writes it as a
+        float32 .npy next to a pickled PredictionTable describing its layout.
+        The fingerprints of the saved model.pkl and preprocessor.pkl are
+        recorded so serving only uses the table with exactly that pair.
+        '''
+        try:
+            config=self.table_config
+            categorical_columns=compiled_preprocessor.categorical_columns
+            categories=[list(c) for c in compiled_preprocessor.categories]
+            table=PredictionTable(
+                table_file_path=config.table_file_path,
+                categorical_columns=categorical_columns,
+                categories=categories,
+                score_columns=config.score_columns,
+                score_min=config.score_min,
+                score_max=config.score_max,
+            )
+            table.source_fingerprint=source_fingerprint
+            table.preprocessor_fingerprint=preprocessor_fingerprint
+
+            scores=np.arange(config.score_min, config.score_max+1, dtype=np.float64)
+            score_grid=[g.ravel() for g in np.meshgrid(scores, scores, indexing="ij")]
+            block=table.n_scores**len(config.score_columns)
+            combos=list(itertools.product(*categories))
+
+            logging.info(f"Building prediction table with {len(combos)*block} entries")
+
+            os.makedirs(os.path.dirname(config.table_file_path), exist_ok=True)
+            tmp_path=config.table_file_path+".tmp.npy"
+            values=np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.float32, shape=(len(combos)*block,))
+
+            for start in range(0, len(combos), config.combos_per_batch):
+                batch=combos[start:start+config.combos_per_batch]
+                columns={
+                    name: np.repeat([combo[j] for combo in batch], block).astype(object)
+                    for j, name in enumerate(categorical_columns)
+                }
+                for k, name in enumerate(config.score_columns):
+                    columns[name]=np.tile(score_grid[k], len(batch))
+
+                preds=model.predict(compiled_preprocessor.transform(columns))
+                values[start*block:(start+len(batch))*block]=preds
+
+            values.flush()
+            del values
+            ## Publish atomically so a serving process never maps a half-written table
+            os.replace(tmp_path, config.table_file_path)
+
+            save_object(file_path=config.table_meta_file_path, obj=table)
+            logging.info("Prediction table saved")
+
+            return config.table_file_path
+
+        except Exception as e:
+            raise CustomException(e, sys)
@@ -4,12 +4,22 @@ from datetime import datetime
 
 LOG_FILE = f"{datetime.now().strftime('%m_%d_%Y_%H_%M_%S')}.log"
 logs_path = os.path.join(os.getcwd(),"logs", LOG_FILE)
-os.makedirs(logs_path)
 
 LOG_FILE_PATH = os.path.join(logs_path, LOG_FILE)
 
+
+class LazyFileHandler(logging.FileHandler):
+    '''
+    Creates the log directory and file on the first record instead of at
+    import time, so importing src.* has no filesystem side effects.
+    '''
+    def _open(self):
+        os.makedirs(os.path.dirname(self.baseFilename), exist_ok=True)
+        return super()._open()
+
+
 logging.basicConfig(
-    filename=LOG_FILE_PATH,
+    handlers=[LazyFileHandler(LOG_FILE_PATH, delay=True)],
     format="[%(asctime)s] %(lineno)d %(name)s - %(levelname)s - %(message)s",
     level = logging.INFO,
 
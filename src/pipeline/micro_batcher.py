@@ -0,0 +1,105 @@
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass
+
+from src.exception import CustomException
+from src.logger import logging
+from src.pipeline.predict_pipeline import PredictPipeline
+
+
+@dataclass
+class MicroBatcherConfig:
+    ## A batch is flushed when it reaches max_batch_size rows or max_wait_ms after its first row
+    max_batch_size: int=64
+    max_wait_ms: float=2.0
+    request_timeout: float=10.0
+
+
+class MicroBatcher:
+    '''
+    Merges concurrent single-row predictions into one predict_fn(rows) call.
+    Request threads enqueue a row and block on a Future; one worker thread
+    drains the queue into batches and resolves the futures in order. If a
+    batch fails its rows are retried one at a time, so a bad row only fails
+    its own request.
+    '''
+    def __init__(self, predict_fn, config=None):
+        self.predict_fn=predict_fn
+        self.batcher_config=config or MicroBatcherConfig()
+        self._queue=queue.Queue()
+        self._worker=None
+        self._worker_lock=threading.Lock()
+
+    def _ensure_worker(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._worker_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker=threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+                self._worker.start()
+
+    def _collect_batch(self):
+        batch=[self._queue.get()]
+        deadline=time.monotonic()+self.batcher_config.max_wait_ms/1000.0
+        while len(batch)<self.batcher_config.max_batch_size:
+            remaining=deadline-time.monotonic()
+            if remaining<=0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch=self._collect_batch()
+            rows=[row for row, _ in batch]
+            try:
+                preds=self.predict_fn(rows)
+                for (_, future), pred in zip(batch, preds):
+                    future.set_result(pred)
+            except Exception as e:
+                if len(batch)==1:
+                    batch[0][1].set_exception(e)
+                    continue
+                ## Score the rows one by one so only the row that fails gets the error
+                logging.info(f"Micro-batch of {len(batch)} rows failed, retrying row by row: {e}")
+                for row, future in batch:
+                    try:
+                        future.set_result(self.predict_fn([row])[0])
+                    except Exception as row_error:
+                        future.set_exception(row_error)
+
+    def submit(self, row):
+        '''
+        Queues one row (a dict of CustomData fields) and returns its prediction.
+        '''
+        try:
+            self._ensure_worker()
+            future=Future()
+            self._queue.put((row, future))
+            return future.result(timeout=self.batcher_config.request_timeout)
+
+        except Exception as e:
+            raise CustomException(e, sys)
+
+
+_batcher=None
+_batcher_lock=threading.Lock()
+
+
+def get_micro_batcher(config=None):
+    '''
+    Returns the process-wide MicroBatcher over PredictPipeline.predict_rows.
+    The config only applies to the call that creates it.
+    '''
+    global _batcher
+    if _batcher is None:
+        with _batcher_lock:
+            if _batcher is None:
+                _batcher=MicroBatcher(PredictPipeline().predict_rows, config)
+    return _batcher
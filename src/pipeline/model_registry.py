@@ -0,0 +1,231 @@
+import os
+import sys
+import threading
+import time
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from src.components.compiled_preprocessor import CompiledPreprocessor
+from src.exception import CustomException
+from src.logger import logging
+from src.utils import as_model_input, file_fingerprint, load_object
+
+## A plausible student used to warm freshly loaded artifacts before they serve traffic
+WARMUP_ROW = {
+    "gender": ["female"],
+    "race_ethnicity": ["group B"],
+    "parental_level_of_education": ["bachelor's degree"],
+    "lunch": ["standard"],
+    "test_preparation_course": ["none"],
+    "reading_score": [72],
+    "writing_score": [74],
+}
+
+
+@dataclass
+class ModelRegistryConfig:
+    model_path: str=os.path.join("artifacts", "model.pkl")
+    preprocessor_path: str=os.path.join("artifacts", "preprocessor.pkl")
+    compiled_preprocessor_path: str=os.path.join("artifacts", "compiled_preprocessor.pkl")
+    prediction_table_path: str=os.path.join("artifacts", "prediction_table.pkl")
+    prediction_table_values_path: str=os.path.join("artifacts", "prediction_table.npy")
+    ## Serve the array-only export of model.pkl when it exists, skipping sklearn/xgboost/catboost unpickling
+    compact_model_path: str=os.path.join("artifacts", "compact_model.pkl")
+    use_compact_model: bool=True
+    ## Array-backed artifacts (compact model, compiled preprocessor) are mapped read-only and shared across workers
+    mmap_mode: str="r"
+    ## Seconds between stat() checks of the artifact files, 0 checks on every request
+    check_interval: float=2.0
+    load_attempts: int=3
+
+
+@dataclass(frozen=True)
+class LoadedArtifacts:
+    model: object
+    preprocessor: object
+    compiled_preprocessor: object
+    prediction_table: object
+    version: tuple
+
+
+class ModelRegistry:
+    '''
+    Keeps one loaded (model, preprocessor) pair per process and swaps in a new
+    pair when either artifact changes on disk. Callers always get a complete
+    snapshot: the new pair is loaded and warmed before the reference is replaced.
+    '''
+    def __init__(self, config=None):
+        self.registry_config=config or ModelRegistryConfig()
+        self._artifacts=None
+        self._lock=threading.Lock()
+        self._last_check=0.0
+
+    def _artifact_version(self):
+        versions=[]
+        for path in (self.registry_config.model_path, self.registry_config.preprocessor_path):
+            stat=os.stat(path)
+            versions.append((stat.st_mtime_ns, stat.st_size))
+
+        ## Optional artifacts, derived or skipped when absent
+        for path in (
+            self.registry_config.compact_model_path,
+            self.registry_config.compiled_preprocessor_path,
+            self.registry_config.prediction_table_path,
+            self.registry_config.prediction_table_values_path,
+        ):
+            if os.path.exists(path):
+                stat=os.stat(path)
+                versions.append((stat.st_mtime_ns, stat.st_size))
+            else:
+                versions.append(None)
+        return tuple(versions)
+
+    def _load_compiled_preprocessor(self, preprocessor, expected):
+        '''
+        Returns a CompiledPreprocessor that matches the sklearn preprocessor on
+        the warmup row, or None if the preprocessor cannot be compiled.
+        '''
+        candidates=[]
+        if os.path.exists(self.registry_config.compiled_preprocessor_path):
+            candidates.append(lambda: load_object(file_path=self.registry_config.compiled_preprocessor_path, mmap_mode=self.registry_config.mmap_mode))
+        candidates.append(lambda: CompiledPreprocessor.from_column_transformer(preprocessor))
+
+        warmup_row={name: values[0] for name, values in WARMUP_ROW.items()}
+        for build in candidates:
+            try:
+                compiled=build()
+                if np.array_equal(compiled.transform_row(warmup_row), expected):
+                    return compiled
+                logging.info("Compiled preprocessor does not match the sklearn preprocessor")
+            except Exception as e:
+                logging.info(f"Compiled preprocessor unavailable: {e}")
+        return None
+
+    def _load_prediction_table(self, expected, model_fingerprint, preprocessor_fingerprint):
+        '''
+        Returns the precomputed PredictionTable if it was built from exactly
+        the current model.pkl and preprocessor.pkl and agrees with the freshly
+        loaded model on the warmup row, otherwise None.
+        '''
+        if not os.path.exists(self.registry_config.prediction_table_path):
+            return None
+        try:
+            table=load_object(file_path=self.registry_config.prediction_table_path)
+            if (table.source_fingerprint, table.preprocessor_fingerprint)!=(model_fingerprint, preprocessor_fingerprint):
+                logging.info("Prediction table was built from a different model.pkl or preprocessor.pkl, not using it")
+                return None
+            table.table_file_path=self.registry_config.prediction_table_values_path
+            warmup_row={name: values[0] for name, values in WARMUP_ROW.items()}
+            if np.isclose(table.lookup(warmup_row), expected, rtol=1e-6):
+                return table
+            logging.info("Prediction table is stale for the loaded model, not using it")
+        except Exception as e:
+            logging.info(f"Prediction table unavailable: {e}")
+        return None
+
+    def _load_model(self, model_fingerprint):
+        '''
+        Returns (model, fingerprint of the preprocessor it was trained with or
+        None if unknown). The model is the compact export of model.pkl when
+        enabled and it was exported from exactly the current model.pkl,
+        otherwise the unpickled estimator. The compact export records which
+        preprocessor.pkl the model was trained with either way.
+        '''
+        compact_path=self.registry_config.compact_model_path
+        if os.path.exists(compact_path):
+            try:
+                compact_model=load_object(file_path=compact_path, mmap_mode=self.registry_config.mmap_mode)
+                if compact_model.source_fingerprint==model_fingerprint:
+                    if self.registry_config.use_compact_model:
+                        return compact_model, compact_model.preprocessor_fingerprint
+                    return load_object(file_path=self.registry_config.model_path), compact_model.preprocessor_fingerprint
+                logging.info("Compact model was exported from a different model.pkl, not using it")
+            except Exception as e:
+                logging.info(f"Compact model unavailable: {e}")
+        return load_object(file_path=self.registry_config.model_path), None
+
+    def _load(self, version):
+        preprocessor_fingerprint=file_fingerprint(self.registry_config.preprocessor_path)
+        model_fingerprint=file_fingerprint(self.registry_config.model_path)
+        model, trained_with=self._load_model(model_fingerprint)
+        if trained_with is not None and trained_with!=preprocessor_fingerprint:
+            raise RuntimeError("model.pkl was trained with a different preprocessor.pkl, not serving the pair")
+        preprocessor=load_object(file_path=self.registry_config.preprocessor_path)
+
+        warmup_df=pd.DataFrame(WARMUP_ROW)
+        warmup_scaled=preprocessor.transform(warmup_df)
+        warmup_pred=model.predict(as_model_input(model, warmup_scaled))
+
+        if hasattr(warmup_scaled, "toarray"):
+            warmup_scaled=warmup_scaled.toarray()
+        compiled_preprocessor=self._load_compiled_preprocessor(preprocessor, warmup_scaled)
+        prediction_table=self._load_prediction_table(warmup_pred[0], model_fingerprint, preprocessor_fingerprint)
+
+        return LoadedArtifacts(
+            model=model,
+            preprocessor=preprocessor,
+            compiled_preprocessor=compiled_preprocessor,
+            prediction_table=prediction_table,
+            version=version,
+        )
+
+    def reload(self, force=False):
+        '''
+        Loads the artifacts if they changed since the last load. A failed load
+        (e.g. a file caught mid-write) keeps the previous pair in service.
+        '''
+        with self._lock:
+            try:
+                for _ in range(self.registry_config.load_attempts):
+                    version=self._artifact_version()
+                    if not force and self._artifacts is not None and self._artifacts.version==version:
+                        return self._artifacts
+
+                    logging.info(f"Loading model artifacts version {version}")
+                    artifacts=self._load(version)
+
+                    ## Only publish the pair if neither file changed while we were reading it
+                    if self._artifact_version()==version:
+                        self._artifacts=artifacts
+                        logging.info("Model artifacts loaded and warmed")
+                        return self._artifacts
+
+                    logging.info("Model artifacts changed during load, retrying")
+
+                raise RuntimeError("Model artifacts kept changing during load")
+
+            except Exception as e:
+                if self._artifacts is None:
+                    raise CustomException(e, sys)
+                logging.info(f"Reloading model artifacts failed, keeping previous version: {e}")
+                return self._artifacts
+
+    def get(self):
+        '''
+        Returns the current LoadedArtifacts, checking the files on disk at most
+        once per check_interval.
+        '''
+        artifacts=self._artifacts
+        now=time.monotonic()
+        if artifacts is None or now-self._last_check>=self.registry_config.check_interval:
+            self._last_check=now
+            artifacts=self.reload()
+        return artifacts
+
+
+_registry=None
+_registry_lock=threading.Lock()
+
+
+def get_model_registry():
+    '''
+    Returns the process-wide ModelRegistry, creating it on first use.
+    '''
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry=ModelRegistry()
+    return _registry
@@ -1,29 +1,153 @@
+import io
 import sys
+from dataclasses import dataclass
+
+import numpy as np
 import pandas as pd
 from src.exception import CustomException
-from src.utils import load_object
-import os
+from src.utils import as_model_input
+from src.pipeline.model_registry import get_model_registry
+from src.pipeline.prediction_cache import get_prediction_cache, make_cache_key, normalize_row
+
+
+@dataclass
+class PredictPipelineConfig:
+    batch_chunk_size: int=10000
+    target_column_name: str="math_score"
+
+
+def fitted_categories(preprocessor):
+    '''
+    Yields (column, set of categories) for every one-hot encoded column of a
+    fitted ColumnTransformer.
+    '''
+    for _, transformer, columns in preprocessor.transformers_:
+        encoder=getattr(transformer, "named_steps", {}).get("one_hot_encoder")
+        if encoder is not None:
+            for name, categories in zip(columns, encoder.categories_):
+                yield name, set(categories)
 
 
 class PredictPipeline:
-    def __init__(self):
-        pass
+    def __init__(self, registry=None, cache=None):
+        self.registry=registry or get_model_registry()
+        self.cache=cache or get_prediction_cache()
+        self.predict_config=PredictPipelineConfig()
 
     def predict(self,features):
         try:
-            model_path=os.path.join("artifacts", "model.pkl")
-            preprocessor_path=os.path.join('artifacts', 'preprocessor.pkl')
-            print("Before Loading")
-            model=load_object(file_path=model_path)
-            preprocessor=load_object(file_path=preprocessor_path)
-            print("After Loading")
-            data_scaled=preprocessor.transform(features)
-            preds=model.predict(data_scaled)
+            artifacts=self.registry.get()
+            data_scaled=artifacts.preprocessor.transform(features)
+            preds=artifacts.model.predict(as_model_input(artifacts.model, data_scaled))
             return preds
         
         except Exception as e:
             raise CustomException(e,sys)
 
+    def unknown_categories(self, row):
+        '''
+        Returns {field: value} for the categorical fields of a dict of
+        CustomData fields whose value the loaded preprocessor was not fitted
+        on. Such a row cannot be scored, so callers can reject it up front.
+        '''
+        try:
+            row=normalize_row(row)
+            artifacts=self.registry.get()
+            compiled=artifacts.compiled_preprocessor
+            if compiled is not None:
+                known=zip(compiled.categorical_columns, compiled.category_index)
+            else:
+                known=fitted_categories(artifacts.preprocessor)
+            return {
+                name: row.get(name) for name, categories in known
+                if row.get(name) is not None and row.get(name) not in categories
+            }
+
+        except Exception as e:
+            raise CustomException(e,sys)
+
+    def predict_rows(self, rows):
+        '''
+        Predicts a list of dicts of CustomData fields. Each row is normalized
+        once (see normalize_row), then rows inside the precomputed prediction
+        table are answered by lookup and the LRU cache is consulted; the rest
+        go through the compiled preprocessor when one is loaded, which skips
+        pandas and ColumnTransformer.
+        '''
+        try:
+            rows=[normalize_row(row) for row in rows]
+            artifacts=self.registry.get()
+            preds=np.empty(len(rows), dtype=np.float64)
+            pending=list(range(len(rows)))
+
+            table=artifacts.prediction_table
+            if table is not None:
+                misses=[]
+                for i in pending:
+                    value=table.lookup(rows[i])
+                    if value is None:
+                        misses.append(i)
+                    else:
+                        preds[i]=value
+                pending=misses
+
+            version=artifacts.version
+            keys={}
+            misses=[]
+            for i in pending:
+                keys[i]=make_cache_key(rows[i])
+                value=self.cache.get(keys[i], version)
+                if value is None:
+                    misses.append(i)
+                else:
+                    preds[i]=value
+            pending=misses
+
+            if not pending:
+                return preds
+
+            pending_rows=[rows[i] for i in pending]
+            compiled=artifacts.compiled_preprocessor
+            if compiled is None:
+                data_scaled=as_model_input(artifacts.model, artifacts.preprocessor.transform(pd.DataFrame(pending_rows)))
+            else:
+                columns={name: [row[name] for row in pending_rows] for name in compiled.input_columns}
+                data_scaled=compiled.transform(columns)
+            preds[pending]=artifacts.model.predict(data_scaled)
+
+            for i in pending:
+                self.cache.put(keys[i], float(preds[i]), version)
+            return preds
+
+        except Exception as e:
+            raise CustomException(e,sys)
+
+    def predict_csv(self, csv_file, chunk_size=None):
+        '''
+        Scores a CSV in the artifacts/test.csv schema chunk by chunk and yields
+        the predicted target column as CSV text, so neither the input nor the
+        output is ever fully held in memory.
+        '''
+        try:
+            chunk_size=chunk_size or self.predict_config.batch_chunk_size
+            target_column_name=self.predict_config.target_column_name
+
+            ## One snapshot for the whole file so every row is scored by the same model version
+            artifacts=self.registry.get()
+
+            yield f"{target_column_name}\n"
+            for chunk in pd.read_csv(csv_file, chunksize=chunk_size):
+                features=chunk.drop(columns=[target_column_name], errors="ignore")
+                data_scaled=as_model_input(artifacts.model, artifacts.preprocessor.transform(features))
+                preds=artifacts.model.predict(data_scaled)
+
+                buffer=io.StringIO()
+                pd.Series(preds).to_csv(buffer, index=False, header=False)
+                yield buffer.getvalue()
+
+        except Exception as e:
+            raise CustomException(e,sys)
+
 
 
 class CustomData:
@@ -67,3 +191,17 @@ class CustomData:
         except Exception as e:
             raise CustomException(e, sys)
 
+    def get_cache_key(self):
+        return make_cache_key(normalize_row(self.get_data_as_dict()))
+
+    def get_data_as_dict(self):
+        return {
+            "gender": self.gender,
+            "race_ethnicity": self.race_ethnicity,
+            "parental_level_of_education": self.parental_level_of_education,
+            "lunch": self.lunch,
+            "test_preparation_course": self.test_preparation_course,
+            "reading_score": self.reading_score,
+            "writing_score": self.writing_score,
+        }
+
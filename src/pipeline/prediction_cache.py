@@ -0,0 +1,114 @@
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+KEY_FIELDS = (
+    "gender",
+    "race_ethnicity",
+    "parental_level_of_education",
+    "lunch",
+    "test_preparation_course",
+    "reading_score",
+    "writing_score",
+)
+
+
+def normalize_row(row):
+    '''
+    Canonical form of a dict of CustomData fields: strings stripped, scores
+    as floats. Rows are normalized once before lookup, caching and scoring,
+    so the cache key always describes the input that was actually scored.
+    '''
+    normalized={}
+    for name in KEY_FIELDS:
+        value=row.get(name)
+        if name.endswith("_score"):
+            value=float(value)
+        elif isinstance(value, str):
+            value=value.strip()
+        normalized[name]=value
+    return normalized
+
+
+def make_cache_key(row):
+    '''
+    Cache key of a row returned by normalize_row, so "72", 72 and 72.0 share
+    one entry.
+    '''
+    return tuple(row[name] for name in KEY_FIELDS)
+
+
+@dataclass
+class PredictionCacheConfig:
+    max_size: int=4096
+
+
+class PredictionCache:
+    '''
+    Bounded LRU map from make_cache_key(normalize_row(row)) to prediction.
+    Entries are tied to the artifacts version they were computed with; the
+    first lookup against a new version empties the cache.
+    '''
+    def __init__(self, config=None):
+        self.cache_config=config or PredictionCacheConfig()
+        self._entries=OrderedDict()
+        self._version=None
+        self._lock=threading.Lock()
+        self.hits=0
+        self.misses=0
+        self.evictions=0
+
+    def _check_version(self, version):
+        if version!=self._version:
+            self._entries.clear()
+            self._version=version
+
+    def get(self, key, version):
+        with self._lock:
+            self._check_version(version)
+            value=self._entries.get(key)
+            if value is None:
+                self.misses+=1
+                return None
+            self._entries.move_to_end(key)
+            self.hits+=1
+            return value
+
+    def put(self, key, value, version):
+        with self._lock:
+            self._check_version(version)
+            self._entries[key]=value
+            self._entries.move_to_end(key)
+            while len(self._entries)>self.cache_config.max_size:
+                self._entries.popitem(last=False)
+                self.evictions+=1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self.cache_config.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+_cache=None
+_cache_lock=threading.Lock()
+
+
+def get_prediction_cache():
+    '''
+    Returns the process-wide PredictionCache, creating it on first use.
+    '''
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache=PredictionCache()
+    return _cache
@@ -0,0 +1,249 @@
+import argparse
+import hashlib
+import inspect
+import json
+import os
+import shutil
+import sys
+import time
+from dataclasses import dataclass, field
+from graphlib import TopologicalSorter
+
+from src.exception import CustomException
+from src.logger import logging
+from src.utils import file_fingerprint
+
+## Config fields that change how fast a stage runs but not what it produces
+IGNORED_CONFIG={"n_jobs", "use_cache", "use_cv_cache"}
+
+
+@dataclass
+class TrainPipelineConfig:
+    state_file_path=os.path.join('artifacts',"train_pipeline_state.json")
+    ## Rerun every stage even if its outputs are still valid
+    force: bool=False
+
+
+@dataclass
+class Stage:
+    '''
+    One node of the training graph. run() takes no arguments and reads its
+    inputs from the configured artifact paths, so any stage can run on its
+    own once its upstream outputs exist.
+    '''
+    name: str
+    run: object
+    config: object
+    ## Source modules whose code is part of the fingerprint (e.g. the model grid)
+    code: list
+    outputs: list
+    depends_on: list=field(default_factory=list)
+    ## Files from outside the pipeline, fingerprinted by content
+    external_inputs: list=field(default_factory=list)
+
+
+def config_fingerprint(config):
+    '''
+    Stable repr of every public setting of a config object, class-level
+    path attributes included.
+    '''
+    names=sorted(
+        name for name in dir(config)
+        if not name.startswith("_") and name not in IGNORED_CONFIG and not callable(getattr(config, name))
+    )
+    return {name: repr(getattr(config, name)) for name in names}
+
+
+def output_signature(path):
+    '''
+    (size, mtime) of a file, or of every file under a directory; None if missing.
+    '''
+    if os.path.isdir(path):
+        return sorted(
+            [os.path.relpath(os.path.join(root, name), path), *output_signature(os.path.join(root, name))]
+            for root, _, names in os.walk(path) for name in names
+        )
+    if not os.path.exists(path):
+        return None
+    stat=os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+class TrainPipeline:
+    '''
+    Runs ingestion -> transformation -> training as a dependency graph. Each
+    stage is fingerprinted from its config, its code, its external inputs and
+    the outputs of the stages it depends on; a stage whose fingerprint matches
+    the last successful run and whose outputs are untouched is skipped.
+    '''
+    def __init__(self, stages=None):
+        self.pipeline_config=TrainPipelineConfig()
+        self.stages={stage.name: stage for stage in (stages or self.default_stages())}
+
+    def default_stages(self):
+        from src.components.data_ingestion import DataIngestion
+        from src.components.data_transformation import DataTransformation
+        from src.components.model_trainer import ModelTrainer
+        from src.components.prediction_table import PredictionTableConfig
+        import src.components.compact_model
+        import src.components.compiled_preprocessor
+        import src.components.data_ingestion
+        import src.components.data_transformation
+        import src.components.early_stopping
+        import src.components.model_search
+        import src.components.model_trainer
+        import src.components.prediction_table
+        import src.utils
+
+        ingestion=DataIngestion()
+        transformation=DataTransformation()
+        trainer=ModelTrainer()
+        ingestion_config=ingestion.ingestion_config
+        transformation_config=transformation.data_transformation_config
+        trainer_config=trainer.model_trainer_config
+        table_config=PredictionTableConfig()
+
+        def run_transformation():
+            from src.components.data_transformation import save_transformed_arrays
+
+            *arrays, _=transformation.initiate_data_transformation(
+                ingestion_config.train_data_path, ingestion_config.test_data_path
+            )
+            ## Always publish what was returned: a cache hit returns arrays from its cache
+            ## entry and leaves whatever an earlier run wrote in transformed_data_dir
+            output_dir=transformation_config.transformed_data_dir
+            tmp_dir=output_dir+".publish"
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            save_transformed_arrays(tmp_dir, arrays)
+            del arrays
+            shutil.rmtree(output_dir, ignore_errors=True)
+            os.replace(tmp_dir, output_dir)
+
+        def run_training():
+            from src.components.data_transformation import load_transformed_arrays
+
+            arrays=load_transformed_arrays(transformation_config.transformed_data_dir)
+            r2_square=trainer.initiate_model_trainer(*arrays)
+            logging.info(f"Best model test r2: {r2_square}")
+
+        return [
+            Stage(
+                name="ingestion",
+                run=ingestion.initiate_data_ingestion,
+                config=ingestion_config,
+                code=[src.components.data_ingestion],
+                external_inputs=[ingestion_config.source_data_path],
+                outputs=[ingestion_config.train_data_path, ingestion_config.test_data_path],
+            ),
+            Stage(
+                name="transformation",
+                run=run_transformation,
+                config=transformation_config,
+                code=[src.components.data_transformation, src.components.compiled_preprocessor],
+                depends_on=["ingestion"],
+                outputs=[
+                    transformation_config.preprocessor_obj_file_path,
+                    transformation_config.compiled_preprocessor_file_path,
+                    transformation_config.transformed_data_dir,
+                ],
+            ),
+            Stage(
+                name="training",
+                run=run_training,
+                config=trainer_config,
+                code=[
+                    src.components.model_trainer,
+                    src.components.model_search,
+                    src.components.early_stopping,
+                    src.components.compact_model,
+                    src.components.prediction_table,
+                    src.utils,
+                ],
+                depends_on=["transformation"],
+                ## Serving artifacts that may legitimately be absent (no compact form, no table)
+                ## are recorded as missing, so deleting or touching one still reruns the stage
+                outputs=[
+                    trainer_config.trained_model_file_path,
+                    trainer_config.training_report_file_path,
+                    trainer_config.compact_model_file_path,
+                    table_config.table_file_path,
+                    table_config.table_meta_file_path,
+                ],
+            ),
+        ]
+
+    def load_state(self):
+        path=self.pipeline_config.state_file_path
+        if not os.path.exists(path):
+            return {}
+        with open(path) as file_obj:
+            return json.load(file_obj)
+
+    def save_state(self, state):
+        path=self.pipeline_config.state_file_path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path=path+".tmp"
+        with open(tmp_path, "w") as file_obj:
+            json.dump(state, file_obj, indent=2)
+        os.replace(tmp_path, path)
+
+    def stage_fingerprint(self, stage, state):
+        payload={
+            "config": config_fingerprint(stage.config),
+            "code": {module.__name__: file_fingerprint(inspect.getsourcefile(module)) for module in stage.code},
+            "external_inputs": {path: file_fingerprint(path) for path in stage.external_inputs},
+            "upstream": {name: state.get(name, {}).get("outputs") for name in stage.depends_on},
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+    def is_valid(self, stage, fingerprint, state):
+        previous=state.get(stage.name)
+        if previous is None or previous.get("fingerprint")!=fingerprint:
+            return False
+        return previous.get("outputs")=={path: output_signature(path) for path in stage.outputs}
+
+    def run(self, force=None):
+        '''
+        Runs the stages in dependency order and returns {stage: {"status":
+        "ran" | "skipped", "wall_time_s": ...}}. State is saved after each
+        stage, so a failure keeps the stages that finished.
+        '''
+        try:
+            force=self.pipeline_config.force if force is None else force
+            state=self.load_state()
+            report={}
+
+            order=TopologicalSorter({name: stage.depends_on for name, stage in self.stages.items()}).static_order()
+            for name in order:
+                stage=self.stages[name]
+                start=time.perf_counter()
+                fingerprint=self.stage_fingerprint(stage, state)
+
+                if not force and self.is_valid(stage, fingerprint, state):
+                    status="skipped"
+                else:
+                    logging.info(f"Running training stage {name}")
+                    stage.run()
+                    status="ran"
+                    state[name]={
+                        "fingerprint": fingerprint,
+                        "outputs": {path: output_signature(path) for path in stage.outputs},
+                    }
+                    self.save_state(state)
+
+                report[name]={"status": status, "wall_time_s": round(time.perf_counter()-start, 3)}
+                logging.info(f"Stage {name} {status} in {report[name]['wall_time_s']}s")
+
+            return report
+
+        except Exception as e:
+            raise CustomException(e, sys)
+
+
+if __name__=="__main__":
+    parser=argparse.ArgumentParser(description="Run the training pipeline, skipping stages whose outputs are up to date")
+    parser.add_argument("--force", action="store_true", help="rerun every stage")
+    args=parser.parse_args()
+
+    for stage_name, stage_report in TrainPipeline().run(force=args.force).items():
+        print(f"{stage_name:<16}{stage_report['status']:<10}{stage_report['wall_time_s']:.3f}s")
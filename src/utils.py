@@ -1,62 +1,259 @@
+import hashlib
 import os
-import sys
-
-import numpy as np 
-import pandas as pd
-import dill
 import pickle
-from sklearn.metrics import r2_score
-from sklearn.model_selection import GridSearchCV
+import sys
+import threading
+import time
 
 from src.exception import CustomException
+from src.logger import logging
 
-def save_object(file_path, obj):
+def save_object(file_path, obj, mmap=False):
+    '''
+    Pickles obj to file_path. With mmap=True the object is written in joblib's
+    format, which stores NumPy arrays as aligned raw buffers that
+    load_object(..., mmap_mode="r") can map read-only instead of copying.
+    '''
     try:
         dir_path = os.path.dirname(file_path)
 
         os.makedirs(dir_path, exist_ok=True)
 
+        if mmap:
+            import joblib
+            joblib.dump(obj, file_path)
+            return
+
         with open(file_path, "wb") as file_obj:
             pickle.dump(obj, file_obj)
 
     except Exception as e:
         raise CustomException(e, sys)
     
-def evaluate_models(X_train, y_train,X_test,y_test,models,param):
+## Estimators whose own thread count is not called n_jobs
+THREAD_PARAMS={"CatBoostRegressor": "thread_count"}
+
+## Wrappers whose `estimator` parameter is the model that actually trains
+WRAPPER_ESTIMATORS={"EarlyStoppingRegressor"}
+
+def unwrap_estimator(model):
+    if type(model).__name__ in WRAPPER_ESTIMATORS:
+        return model.estimator
+    return model
+
+def set_estimator_threads(model, n_threads):
+    '''
+    Caps the estimator's own threads. Returns False if it has no thread setting.
+    '''
+    model=unwrap_estimator(model)
+    param=THREAD_PARAMS.get(type(model).__name__)
+    if param is None and "n_jobs" in model.get_params():
+        param="n_jobs"
+    if param is None:
+        return False
+    model.set_params(**{param: n_threads})
+    return True
+
+## Estimators that accept sparse X but do not learn the same model from it:
+## XGBoost treats the implicit zeros of a CSR matrix as missing values, and
+## LinearRegression switches to an iterative lsqr solve instead of lstsq
+DENSE_INPUT_ESTIMATORS={"XGBRegressor", "LinearRegression"}
+
+def as_model_input(model, X):
+    '''
+    Returns X as the estimator should see it: sparse matrices are passed
+    through unchanged except for DENSE_INPUT_ESTIMATORS, which get a dense copy.
+    '''
+    if hasattr(X, "toarray") and type(unwrap_estimator(model)).__name__ in DENSE_INPUT_ESTIMATORS:
+        return X.toarray()
+    return X
+
+def split_core_budget(n_models, n_jobs):
+    '''
+    Splits a total core budget into (models searched concurrently, cores per model).
+    '''
+    n_jobs=max(1, n_jobs)
+    model_workers=min(n_models, n_jobs)
+    return model_workers, max(1, n_jobs//model_workers)
+
+def current_rss_mb():
+    '''
+    Current resident set size of this process in MB, or None where
+    /proc/self/statm is unavailable (macOS, Windows).
+    '''
     try:
-        report = {}
+        with open("/proc/self/statm") as file_obj:
+            pages=int(file_obj.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return pages*os.sysconf("SC_PAGE_SIZE")/(1024*1024)
+
+class RSSSampler:
+    '''
+    Samples this process's RSS from a background thread while the with-block
+    runs. peak_delta_mb is the highest RSS seen minus the RSS at entry, i.e.
+    the extra memory the block itself needed, independent of what earlier
+    work in the same (possibly reused) process left behind. None where RSS
+    cannot be read.
+    '''
+    def __init__(self, interval=0.01):
+        self.interval=interval
+        self.peak_delta_mb=None
+        self._stop=threading.Event()
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self._peak=max(self._peak, current_rss_mb())
+
+    def __enter__(self):
+        self._start=current_rss_mb()
+        if self._start is not None:
+            self._peak=self._start
+            self._thread=threading.Thread(target=self._sample, name="rss-sampler", daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._start is not None:
+            self._stop.set()
+            self._thread.join()
+            self._peak=max(self._peak, current_rss_mb())
+            self.peak_delta_mb=self._peak-self._start
+        return False
 
-        for i in range(len(list(models))):
-            model = list(models.values())[i]
-            para=param[list(models.keys())[i]]
+def evaluate_model(X_train, y_train, X_test, y_test, model, para, n_threads=1, search_options=None):
+    '''
+    Searches one model's hyperparameters and returns (fitted best estimator,
+    test r2, stats). The search's own refit is reused rather than fitting the
+    best configuration a second time. The model's cores go to its own threads
+    when it has them, otherwise to the CV fits. search_options are passed to
+    make_search_cv (mode and budgets).
+    '''
+    from sklearn.metrics import r2_score
+    from src.components.early_stopping import EarlyStoppingRegressor, boosting_rounds
+    from src.components.model_search import make_search_cv
 
-            gs = GridSearchCV(model,para,cv=3)
-            gs.fit(X_train,y_train)
+    search_n_jobs=None if set_estimator_threads(model, n_threads) or n_threads==1 else n_threads
 
-            model.set_params(**gs.best_params_)
-            model.fit(X_train,y_train)
+    gs = make_search_cv(model,para,cv=3,n_jobs=search_n_jobs,**(search_options or {}))
 
-            #model.fit(X_train, y_train)  # Train model
+    X_train=as_model_input(model, X_train)
+    X_test=as_model_input(model, X_test)
 
-            y_train_pred = model.predict(X_train)
+    start=time.perf_counter()
+    with RSSSampler() as rss:
+        gs.fit(X_train,y_train)
+    fit_time=time.perf_counter()-start
 
-            y_test_pred = model.predict(X_test)
+    best_model=gs.best_estimator_
+    ## The fitted booster itself is what gets saved and served
+    if isinstance(best_model, EarlyStoppingRegressor):
+        best_model=best_model.estimator_
 
-            train_model_score = r2_score(y_train, y_train_pred)
+    start=time.perf_counter()
+    y_test_pred = best_model.predict(X_test)
+    predict_time=time.perf_counter()-start
 
-            test_model_score = r2_score(y_test, y_test_pred)
+    test_model_score = r2_score(y_test, y_test_pred)
 
-            report[list(models.keys())[i]] = test_model_score
+    stats={
+        "test_r2": float(test_model_score),
+        "best_params": gs.best_params_,
+        "search_time_s": fit_time-gs.refit_time_,
+        "refit_time_s": gs.refit_time_,
+        "predict_time_s": predict_time,
+        "n_fits": getattr(gs, "n_fits_", len(gs.cv_results_["params"])*gs.n_splits_)+1,
+        "cv_cache_hits": getattr(gs, "n_cached_", 0),
+        "boosting_rounds": boosting_rounds(best_model),
+        ## Only memory of the process running the search; CV fits in worker processes are not included
+        "fit_peak_rss_delta_mb": rss.peak_delta_mb,
+    }
+    return best_model, test_model_score, stats
+
+def evaluate_models(X_train, y_train,X_test,y_test,models,param,n_jobs=1,search_options=None,training_report=None):
+    '''
+    Searches every model and returns {name: test r2}. With n_jobs > 1 the
+    models are searched concurrently in a process pool and the budget is split
+    between models and each model's own threads, so the total never exceeds
+    n_jobs. The fitted estimators replace the entries of `models`.
+    search_options selects the search mode and its per-model budget, see
+    src.components.model_search.make_search_cv. If a training_report dict is
+    given it is filled with each model's timings, fit count and the peak RSS
+    growth of its search.
+    '''
+    ## Training-only dependency, kept out of the serving import path
+    from joblib import Parallel, delayed, parallel_config
+
+    try:
+        report = {}
+        names = list(models.keys())
+
+        model_workers, n_threads = split_core_budget(len(names), n_jobs)
+        logging.info(f"Searching {len(names)} models, {model_workers} at a time with {n_threads} cores each")
+
+        ## inner_max_num_threads also caps BLAS/OpenMP threads inside the workers
+        with parallel_config(backend="loky", inner_max_num_threads=n_threads):
+            results = Parallel(n_jobs=model_workers)(
+                delayed(evaluate_model)(
+                    X_train, y_train, X_test, y_test, models[name], param[name], n_threads, search_options
+                )
+                for name in names
+            )
+
+        for name, (model, test_model_score, stats) in zip(names, results):
+            models[name] = model
+            report[name] = test_model_score
+            if training_report is not None:
+                training_report[name] = stats
+            logging.info(f"{name}: {stats}")
 
         return report
 
     except Exception as e:
         raise CustomException(e, sys)
     
-def load_object(file_path):
+def file_fingerprint(file_path, block_size=1<<20):
     try:
+        digest=hashlib.sha256()
         with open(file_path, "rb") as file_obj:
-            return pickle.load(file_obj)
+            for block in iter(lambda: file_obj.read(block_size), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    except Exception as e:
+        raise CustomException(e, sys)
+
+class JoblibFormat(Exception):
+    pass
+
+class PlainUnpickler(pickle.Unpickler):
+    '''
+    pickle.Unpickler that stops at the first array wrapper of a file written
+    by save_object(..., mmap=True): the raw array buffer joblib writes after
+    it is not pickle data.
+    '''
+    def find_class(self, module, name):
+        if module.startswith("joblib.") and name=="NumpyArrayWrapper":
+            raise JoblibFormat()
+        return super().find_class(module, name)
+
+def load_object(file_path, mmap_mode=None):
+    '''
+    Loads an object written by save_object, in either format. With mmap_mode
+    (e.g. "r") the arrays of a joblib-format file are memory-mapped, so every
+    process that loads the same file shares one page-cache copy; without it
+    they are read into memory. Plain pickles load as usual.
+    '''
+    try:
+        if not mmap_mode:
+            with open(file_path, "rb") as file_obj:
+                try:
+                    return PlainUnpickler(file_obj).load()
+                except JoblibFormat:
+                    pass
+
+        import joblib
+        return joblib.load(file_path, mmap_mode=mmap_mode)
 
     except Exception as e:
         raise CustomException(e, sys)
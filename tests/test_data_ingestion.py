@@ -0,0 +1,35 @@
+import os
+
+import pandas as pd
+
+from src.components.data_ingestion import DataIngestion
+
+REPO_ROOT=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def streaming_split(source_path, output_dir, chunk_size):
+    ingestion=DataIngestion()
+    config=ingestion.ingestion_config
+    config.ingestion_mode="streaming"
+    config.source_data_path=source_path
+    config.chunk_size=chunk_size
+    config.train_data_path=os.path.join(output_dir,"train.csv")
+    config.test_data_path=os.path.join(output_dir,"test.csv")
+    config.raw_data_path=os.path.join(output_dir,"data.csv")
+    train_path,test_path=ingestion.initiate_data_ingestion()
+    with open(train_path) as train_file, open(test_path) as test_file:
+        return train_file.read(),test_file.read()
+
+
+def test_streaming_split_does_not_depend_on_chunk_size(tmp_path):
+    ## A blank score makes pandas infer float64 for that column in one chunk only
+    df=pd.read_csv(os.path.join(REPO_ROOT,"notebook","data","stud.csv"))
+    df["reading_score"]=df["reading_score"].astype(object)
+    df.loc[150,"reading_score"]=""
+    source_path=os.path.join(tmp_path,"stud.csv")
+    df.to_csv(source_path,index=False)
+
+    small=streaming_split(source_path,os.path.join(tmp_path,"small"),chunk_size=100)
+    large=streaming_split(source_path,os.path.join(tmp_path,"large"),chunk_size=1000)
+
+    assert small==large
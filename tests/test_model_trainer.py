@@ -0,0 +1,36 @@
+import os
+
+import numpy as np
+
+from src.components.data_transformation import DataTransformation
+from src.components.model_trainer import ModelTrainer
+from src.components.prediction_table import PredictionTableConfig
+from src.utils import load_object
+
+REPO_ROOT=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_trainer_builds_prediction_table_from_compiled_preprocessor(tmp_path, monkeypatch):
+    ## Artifact paths are relative to the working directory
+    monkeypatch.chdir(tmp_path)
+
+    transformation=DataTransformation()
+    transformation.data_transformation_config.use_cache=False
+    X_train,y_train,X_test,y_test,_=transformation.initiate_data_transformation(
+        os.path.join(REPO_ROOT,"artifacts","train.csv"),
+        os.path.join(REPO_ROOT,"artifacts","test.csv"),
+    )
+
+    trainer=ModelTrainer()
+    config=trainer.model_trainer_config
+    config.build_prediction_table=True
+    config.use_cv_cache=False
+    config.n_jobs=1
+    config.search_mode="random"
+    config.search_max_fits=3
+
+    r2_square=trainer.initiate_model_trainer(X_train,y_train,X_test,y_test)
+
+    assert r2_square>0.6
+    table=load_object(PredictionTableConfig().table_meta_file_path)
+    assert np.isfinite(np.asarray(table.values)).all()
@@ -0,0 +1,35 @@
+import os
+import shutil
+
+import pandas as pd
+
+from src.components.data_transformation import load_transformed_arrays
+from src.pipeline.train_pipeline import TrainPipeline
+
+REPO_ROOT=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_data_stages(test_size):
+    pipeline=TrainPipeline()
+    del pipeline.stages["training"]
+    pipeline.stages["ingestion"].config.test_size=test_size
+    pipeline.stages["transformation"].config.fit_mode="chunked"
+    pipeline.stages["transformation"].config.chunk_size=100
+    pipeline.run()
+    return pipeline
+
+
+def test_transformed_arrays_follow_a_transformation_cache_hit(tmp_path, monkeypatch):
+    ## Artifact paths are relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    os.makedirs(os.path.join("notebook","data"))
+    shutil.copyfile(os.path.join(REPO_ROOT,"notebook","data","stud.csv"), os.path.join("notebook","data","stud.csv"))
+
+    ## The third run is a transformation cache hit for the data of the first
+    for test_size in (0.2, 0.5, 0.2):
+        pipeline=run_data_stages(test_size)
+
+        ingestion_config=pipeline.stages["ingestion"].config
+        X_train,y_train,X_test,y_test=load_transformed_arrays(pipeline.stages["transformation"].config.transformed_data_dir)
+        assert X_train.shape[0]==len(y_train)==len(pd.read_csv(ingestion_config.train_data_path))
+        assert X_test.shape[0]==len(y_test)==len(pd.read_csv(ingestion_config.test_data_path))